@@ -6,7 +6,8 @@ configuring paths, and defining functions to handle user interactions such as ad
 import os
 import sys
 
-from aqt import mw
+from anki import hooks
+from aqt import gui_hooks, mw
 from aqt.qt import QAction, QKeySequence, QMenu
 from aqt.utils import qconnect, showInfo
 
@@ -22,13 +23,19 @@ try:
     from .remote_decks.libs.org_to_anki.utils import (
         getAnkiPluginConnector as getConnector,
     )
+    from .remote_decks.log import configure_logging, get_logger
+    from .remote_decks.log_dialog import show_log_dialog
     from .remote_decks.main import add_new_deck
     from .remote_decks.main import remove_remote_deck as rDecks
     from .remote_decks.main import sync_decks as sDecks
+    from .remote_decks.note_index import forget_notes
+    from .remote_decks.scheduler import AutoSyncScheduler
 except Exception as e:
     showInfo(f"Error importing modules from the sheets2anki plugin:\n{e}")
     raise
 
+logger = get_logger("menu")
+
 errorTemplate = """
 Hello! It seems an error occurred during execution.
 
@@ -47,7 +54,7 @@ def add_deck():
         ankiBridge.startEditing()
         add_new_deck()
     except Exception as e:
-        print(f"Error in add_deck: {e.with_traceback()}")  # Debug message
+        logger.exception("Error in add_deck")
         errorMessage = str(e)
         showInfo(errorTemplate.format(errorMessage))
         if ankiBridge.getConfig().get("debug", False):
@@ -60,7 +67,7 @@ def add_deck():
 
 
 def sync_decks():
-    """Function to sync remote decks."""
+    """Function to sync remote decks in the background."""
     try:
         ankiBridge = getConnector()
         ankiBridge.startEditing()
@@ -74,7 +81,24 @@ def sync_decks():
             trace = traceback.format_exc()
             showInfo(str(trace))
     finally:
-        showInfo("Synchronization complete")
+        ankiBridge.stopEditing()
+
+
+def rebuild_decks():
+    """Function to rebuild remote decks from their saved snapshots."""
+    try:
+        ankiBridge = getConnector()
+        ankiBridge.startEditing()
+        sDecks(from_snapshots=True)
+    except Exception as e:
+        errorMessage = str(e)
+        showInfo(errorTemplate.format(errorMessage))
+        if ankiBridge.getConfig().get("debug", False):
+            import traceback
+
+            trace = traceback.format_exc()
+            showInfo(str(trace))
+    finally:
         ankiBridge.stopEditing()
 
 
@@ -113,8 +137,37 @@ if mw is not None:
     qconnect(syncDecksAction.triggered, sync_decks)
     remoteDecksSubMenu.addAction(syncDecksAction)
 
+    # Action to "Rebuild Decks from Snapshots"
+    rebuildDecksAction = QAction("Rebuild Decks from Saved Snapshots", mw)
+    qconnect(rebuildDecksAction.triggered, rebuild_decks)
+    remoteDecksSubMenu.addAction(rebuildDecksAction)
+
     # Action to "Disconnect a remote Deck"
     remove_remote_deck = QAction("Disconnect a remote Deck", mw)
     remove_remote_deck.setShortcut(QKeySequence("Ctrl+Shift+D"))
     qconnect(remove_remote_deck.triggered, remove_remote)
     remoteDecksSubMenu.addAction(remove_remote_deck)
+
+    # Action to "Show Log"
+    showLogAction = QAction("Show sheets2anki Log", mw)
+    qconnect(showLogAction.triggered, show_log_dialog)
+    remoteDecksSubMenu.addAction(showLogAction)
+
+    # Log at the level set by the "debug" key of the config
+    configure_logging(mw.addonManager.getConfig(__name__))
+
+    # Sync remote decks automatically in the background, if enabled in the config
+    autoSyncScheduler = AutoSyncScheduler()
+    gui_hooks.profile_did_open.append(autoSyncScheduler.start)
+    gui_hooks.profile_will_close.append(autoSyncScheduler.stop)
+
+    def on_config_updated(config: dict) -> None:
+        # Apply the settings edited in the Config dialog without a restart
+        configure_logging(config)
+        if mw.col is not None:
+            autoSyncScheduler.start()
+
+    mw.addonManager.setConfigUpdatedAction(__name__, on_config_updated)
+
+    # Keep the note index of the remote decks in step with notes deleted in Anki
+    hooks.notes_will_be_deleted.append(forget_notes)
@@ -0,0 +1,88 @@
+"""Compares the memory held by a parsed sheet with dict and slotted notecards.
+
+Run from the root of the repository:
+
+    python benchmarks/notecard_memory.py [rows]
+
+Both forms are built from the same rows, shaped like a published Google Sheet:
+a key column and a few text columns. Cells without surrounding spaces are
+shared with the rows rather than copied, so what is measured is the cost of the
+containers around the values.
+"""
+
+import os
+import sys
+import tracemalloc
+from typing import Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from remote_decks.models.notecard import Notecard  # noqa: E402
+
+DEFAULT_ROW_COUNT = 100_000
+
+HEADERS = ["Front", "Back", "Example", "Notes"]
+
+
+def generate_rows(row_count: int) -> list[list[str]]:
+    """Returns synthetic CSV rows, as the csv module would, without the header."""
+    return [
+        [
+            f"word {index}",
+            f"translation of word {index}",
+            f"An example sentence using word {index}.",
+            "" if index % 3 else f"note {index}",
+        ]
+        for index in range(row_count)
+    ]
+
+
+def build_dict_notecards(rows: list[list[str]]) -> list[dict]:
+    """Builds notecards the way the parser used to: one dict, and an inner dict, per row."""
+    header_indices = {header: idx for idx, header in enumerate(HEADERS)}
+    notecards = []
+    for row in rows:
+        fields = {}
+        for field_name, idx in header_indices.items():
+            fields[field_name] = row[idx].strip() if idx < len(row) else ""
+        notecards.append({"type": "Basic", "fields": fields, "tags": []})
+    return notecards
+
+
+def build_slotted_notecards(rows: list[list[str]]) -> list[Notecard]:
+    """Builds notecards the way the parser does now: a tuple of values per row."""
+    columns = list(range(len(HEADERS)))
+    return [Notecard(tuple([row[idx].strip() for idx in columns])) for row in rows]
+
+
+def measure(build: Callable[[list[list[str]]], list], rows: list[list[str]]) -> int:
+    """Returns the bytes still allocated once build has returned."""
+    tracemalloc.start()
+    try:
+        notecards = build(rows)
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del notecards
+    return size
+
+
+def main() -> None:
+    row_count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROW_COUNT
+    rows = generate_rows(row_count)
+
+    results = [
+        ("dict notecards", measure(build_dict_notecards, rows)),
+        ("slotted notecards", measure(build_slotted_notecards, rows)),
+    ]
+    baseline = results[0][1]
+    print(f"{row_count} rows of {len(HEADERS)} columns")
+    for name, size in results:
+        print(
+            f"{name:>18}: {size / 2**20:7.1f} MiB, {size / row_count:6.0f} B/row, "
+            f"{size / baseline:4.0%} of dict notecards"
+        )
+
+
+if __name__ == "__main__":
+    main()
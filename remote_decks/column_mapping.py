@@ -0,0 +1,124 @@
+"""Mapping of the columns of a sheet to the fields of a note type.
+
+Without a mapping, the headers of the sheet must be exactly the fields of the
+note type. The "column_mapping" entry of a deck relaxes this, by field name:
+
+    "column_mapping": {
+        "Front": "Question",
+        "Back": {"column": "Answer", "default": "?"},
+        "Source": {"value": "Textbook"}
+    }
+
+A string reads the field from the column of that header, "default" fills in
+empty cells and "value" gives the field the same text on every row. Fields
+left out are read from the column of the same name if there is one, and
+columns that no field reads are ignored.
+
+The mapping is compiled once per sheet into a row projector, which picks the
+cells it needs out of each row with a single itemgetter call.
+"""
+
+from operator import itemgetter
+from typing import Callable, Iterable, Optional
+
+# Picks the values of a row, in the order of the field names, or None if it is empty
+RowProjector = Callable[[list[str]], Optional[tuple[str, ...]]]
+
+
+def compile_row_projector(
+    headers: list[str],
+    note_type_fields: list[str],
+    column_mapping: Optional[dict] = None,
+    ignored_columns: Iterable[str] = (),
+) -> tuple[list[str], RowProjector]:
+    """Works out which cell of a row goes to which field, once for all rows.
+
+    Args:
+        headers (list[str]): The stripped headers of the sheet.
+        note_type_fields (list[str]): List of fields in the note type.
+        column_mapping (dict, optional): The column mapping of the deck. Without one,
+            the headers must match the fields exactly. Defaults to None.
+        ignored_columns (Iterable[str], optional): Headers read separately, such as the
+            tags column. Defaults to ().
+    Returns:
+        tuple[list[str], RowProjector]: The names of the fields filled in, and the function
+            returning their values for a row, stripped. Rows whose cells read are all
+            empty give None.
+    Raises:
+        Exception: If the headers do not fit the note type or the mapping.
+    """
+    ignored_columns = set(ignored_columns)
+    note_type_fields = [field.strip() for field in note_type_fields]
+    # The last column wins when a header is repeated
+    header_indices = {
+        header: index
+        for index, header in enumerate(headers)
+        if header not in ignored_columns
+    }
+
+    field_names: list[str] = []
+    indices: list[int] = []
+    defaults: list[str] = []
+    constant_names: list[str] = []
+    constants: list[str] = []
+    if column_mapping is None:
+        if set(header_indices) != set(note_type_fields):
+            raise Exception(
+                f"CSV headers do not match note type fields.\nheaders:{headers}\nrequired note type fields:{note_type_fields}"
+            )
+        field_names = list(header_indices)
+        indices = list(header_indices.values())
+    else:
+        unknown_fields = set(column_mapping) - set(note_type_fields)
+        if unknown_fields:
+            raise Exception(
+                f"The column mapping names fields the note type does not have: {', '.join(sorted(unknown_fields))}"
+            )
+        for field in note_type_fields:
+            rule = column_mapping.get(field, field if field in header_indices else None)
+            if rule is None:
+                continue  # Left as it is in Anki
+            if isinstance(rule, dict) and "value" in rule:
+                constant_names.append(field)
+                constants.append(str(rule["value"]))
+                continue
+            column = rule.get("column", field) if isinstance(rule, dict) else rule
+            if column not in header_indices:
+                raise Exception(
+                    f"The sheet has no column named {column!r}, mapped to the {field} field."
+                )
+            field_names.append(field)
+            indices.append(header_indices[column])
+            default = rule.get("default") if isinstance(rule, dict) else None
+            defaults.append("" if default is None else str(default))
+
+    if not indices:
+        raise Exception("No column of the sheet is mapped to a field of the note type.")
+
+    if len(indices) == 1:
+        # itemgetter returns a single item rather than a tuple for one index
+        column_index = indices[0]
+
+        def get_cells(row: list[str]) -> tuple[str, ...]:
+            return (row[column_index],)
+
+    else:
+        get_cells = itemgetter(*indices)
+    width = max(indices) + 1
+    constant_values = tuple(constants)
+    default_values = tuple(defaults) if any(defaults) else None
+
+    def project(row: list[str]) -> Optional[tuple[str, ...]]:
+        if len(row) < width:
+            # Missing trailing cells are empty
+            row = row + [""] * (width - len(row))
+        values = tuple(map(str.strip, get_cells(row)))
+        if not any(values):
+            return None
+        if default_values is not None:
+            values = tuple(
+                [value or default for value, default in zip(values, default_values)]
+            )
+        return values + constant_values if constant_values else values
+
+    return field_names + constant_names, project
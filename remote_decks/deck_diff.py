@@ -0,0 +1,95 @@
+import hashlib
+from typing import Optional
+
+from .models.notecard import Notecard
+from .models.remote_deck import RemoteDeck
+from .models.remote_deck_diff import RemoteDeckDiff
+
+
+def compute_row_hash(notecard: Notecard, field_names: list[str]) -> str:
+    """Computes a digest of everything a notecard writes to its note.
+
+    Args:
+        notecard (Notecard): The notecard built from a CSV row.
+        field_names (list[str]): The names of its fields, in CSV column order.
+    Returns:
+        str: The hex SHA-1 digest of its fields and tags.
+    """
+    parts = [
+        f"{name}\x1f{value}"
+        for name, value in sorted(zip(field_names, notecard.values))
+    ]
+    parts.append(" ".join(notecard.tags or ()))
+    return hashlib.sha1("\x1e".join(parts).encode("utf-8")).hexdigest()
+
+
+def diff_remote_deck(
+    remote_deck: RemoteDeck,
+    notecard_key_field: str,
+    previous_row_hashes: Optional[dict[str, str]] = None,
+) -> RemoteDeckDiff:
+    """Compares the rows of a sheet with the version applied by the last sync.
+
+    Rows are matched by their key field. When a key appears more than once the
+    last row wins, the same as when each row updates the note in turn.
+
+    Args:
+        remote_deck (RemoteDeck): The newly parsed remote deck.
+        notecard_key_field (str): The field used as a unique key for notecards.
+        previous_row_hashes (dict[str, str], optional): Row hashes by key from the last sync.
+            Without them every row counts as added. Defaults to None.
+    Returns:
+        RemoteDeckDiff: The added, changed and unchanged rows. Notes whose row is gone are
+            found through the note index instead.
+    """
+    if previous_row_hashes is None:
+        previous_row_hashes = {}
+
+    if notecard_key_field not in remote_deck.field_names:
+        raise Exception(
+            f"The key field {notecard_key_field} is not read from any column of the sheet."
+        )
+    key_column = remote_deck.field_names.index(notecard_key_field)
+    notecards_by_key = {}
+    for notecard in remote_deck.notecards:
+        notecards_by_key[notecard.values[key_column]] = notecard
+
+    remote_deck_diff = RemoteDeckDiff()
+    for key, notecard in notecards_by_key.items():
+        row_hash = compute_row_hash(notecard, remote_deck.field_names)
+        remote_deck_diff.row_hashes[key] = row_hash
+
+        previous_row_hash = previous_row_hashes.get(key)
+        if previous_row_hash is None:
+            remote_deck_diff.added.append(notecard)
+        elif previous_row_hash != row_hash:
+            remote_deck_diff.changed.append(notecard)
+        else:
+            remote_deck_diff.unchanged.append(notecard)
+    return remote_deck_diff
+
+
+def diff_appended_rows(
+    remote_deck: RemoteDeck,
+    notecard_key_field: str,
+    previous_row_hashes: dict[str, str],
+) -> RemoteDeckDiff:
+    """Compares rows appended to a sheet with the version applied by the last sync.
+
+    Args:
+        remote_deck (RemoteDeck): The rows added at the bottom of the sheet.
+        notecard_key_field (str): The field used as a unique key for notecards.
+        previous_row_hashes (dict[str, str]): Row hashes by key from the last sync.
+    Returns:
+        RemoteDeckDiff: The added and changed rows, and the hashes of every row of the
+            sheet.
+    """
+    remote_deck_diff = diff_remote_deck(
+        remote_deck, notecard_key_field, previous_row_hashes
+    )
+    # Every row above the new ones is still there, unchanged
+    remote_deck_diff.row_hashes = {
+        **previous_row_hashes,
+        **remote_deck_diff.row_hashes,
+    }
+    return remote_deck_diff
@@ -0,0 +1,102 @@
+"""Encoding detection for downloaded sheets.
+
+Detection only ever looks at a bounded prefix of the payload: byte order marks
+are sniffed first, then the prefix is checked as strict UTF-8. Only if that
+fails is the encoding remembered from the last sync of the deck tried, and
+failing that the vendored chardet asked for a guess. UTF-8 always comes first
+since it rejects most other text, while a single-byte encoding such as
+Windows-1252 accepts nearly anything.
+"""
+
+import codecs
+from typing import BinaryIO, Optional
+
+# Number of bytes looked at to detect the encoding
+SNIFF_SIZE = 64 * 1024
+
+# Encoding used when nothing better can be guessed, as for a sheet saved by Excel
+FALLBACK_ENCODING = "cp1252"
+
+# Longest marks first, since the UTF-32 LE mark starts with the UTF-16 LE one
+BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+]
+
+
+def detect_encoding(
+    stream: BinaryIO, preferred_encoding: Optional[str] = None
+) -> tuple[str, int]:
+    """Detects the encoding of a CSV from the start of the stream.
+
+    Args:
+        stream (BinaryIO): The raw CSV bytes, positioned at the start. It is rewound afterwards.
+        preferred_encoding (str, optional): Encoding to try instead of guessing when the
+            CSV is not UTF-8, typically the one detected for the same deck last time.
+            Defaults to None.
+    Returns:
+        tuple[str, int]: The encoding and the length of the byte order mark to skip.
+    """
+    prefix = stream.read(SNIFF_SIZE)
+    at_end = not stream.read(1)
+    stream.seek(0)
+
+    bom_length = 0
+    for bom, encoding in BOMS:
+        if prefix.startswith(bom):
+            bom_length = len(bom)
+            if encoding != "utf-8":
+                return encoding, bom_length
+            # Some exports put a UTF-8 mark in front of Windows-1252 content
+            break
+    prefix = prefix[bom_length:]
+
+    for encoding in ("utf-8", preferred_encoding):
+        if encoding and is_valid_prefix(prefix, encoding, at_end):
+            return encoding, bom_length
+    return guess_encoding(prefix), bom_length
+
+
+def is_valid_prefix(prefix: bytes, encoding: str, at_end: bool) -> bool:
+    """Checks that a prefix decodes strictly, allowing a character cut at the end.
+
+    Args:
+        prefix (bytes): The start of the payload.
+        encoding (str): The encoding to check.
+        at_end (bool): Whether the prefix is the whole payload.
+    Returns:
+        bool: True if the prefix is valid in that encoding.
+    """
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(prefix, final=at_end)
+    except (LookupError, UnicodeDecodeError):
+        return False
+    return True
+
+
+def guess_encoding(prefix: bytes) -> str:
+    """Asks chardet for the encoding of a prefix that is not valid UTF-8.
+
+    Args:
+        prefix (bytes): The start of the payload, without byte order mark.
+    Returns:
+        str: The guessed encoding, or FALLBACK_ENCODING.
+    """
+    # Imported here so syncs of UTF-8 sheets never pay for loading chardet
+    from .libs import chardet
+
+    encoding = chardet.detect(prefix[:SNIFF_SIZE]).get("encoding")
+    if not encoding or encoding.lower() in ("ascii", "utf-8"):
+        # The prefix is plain ASCII and the offending bytes come later
+        return FALLBACK_ENCODING
+    try:
+        encoding = codecs.lookup(encoding).name
+    except LookupError:
+        return FALLBACK_ENCODING
+    if encoding == "iso8859-1":
+        # Like browsers do, read Latin-1 as its Windows superset
+        return FALLBACK_ENCODING
+    return encoding
@@ -0,0 +1,331 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Optional
+
+from .deck_diff import diff_appended_rows, diff_remote_deck
+from .log import get_logger
+from .models.remote_csv import RemoteCsv
+from .models.remote_deck_config import RemoteDeckConfig
+from .models.remote_deck_fetch import RemoteDeckFetch
+from .models.sync_progress import SyncProgress
+from .parse_remote_deck import (
+    RemoteCsvUnavailableError,
+    build_appended_remote_deck,
+    build_remote_deck_from_remote_csv,
+    download_remote_csv,
+)
+from .snapshots import has_snapshot, load_row_hashes, load_snapshot, save_snapshot
+from .workbook import Workbook, get_workbook_url
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_CONCURRENT_FETCHES = 4
+
+
+def fetch_remote_decks(
+    remote_deck_configs: list[RemoteDeckConfig],
+    max_workers: int = DEFAULT_MAX_CONCURRENT_FETCHES,
+    progress: Optional[SyncProgress] = None,
+    from_snapshots: bool = False,
+) -> list[RemoteDeckFetch]:
+    """Downloads, decodes and parses remote decks in parallel.
+
+    Nothing here touches the Anki collection, so the results can be applied to
+    it afterwards one after another on the main thread. Decks read from tabs
+    of the same spreadsheet share a single download of it, see
+    fetch_workbook_decks.
+
+    Args:
+        remote_deck_configs (list[RemoteDeckConfig]): The decks to fetch.
+        max_workers (int, optional): Maximum number of concurrent downloads. Defaults to DEFAULT_MAX_CONCURRENT_FETCHES.
+        progress (SyncProgress, optional): Receives progress and signals cancellation. Defaults to None.
+        from_snapshots (bool, optional): Rebuild from the saved snapshots without downloading. Defaults to False.
+    Returns:
+        list[RemoteDeckFetch]: One result per deck, in the order of remote_deck_configs.
+    """
+    if not remote_deck_configs:
+        return []
+
+    # Indices of the decks downloaded on their own, and of those sharing a workbook
+    deck_indices = []
+    workbook_indices: dict[str, list[int]] = {}
+    for index, remote_deck_config in enumerate(remote_deck_configs):
+        if remote_deck_config.sheet_name is not None and not from_snapshots:
+            workbook_url = get_workbook_url(remote_deck_config.url)
+            workbook_indices.setdefault(workbook_url, []).append(index)
+        else:
+            deck_indices.append(index)
+
+    download_count = len(deck_indices) + len(workbook_indices)
+    max_workers = max(1, min(int(max_workers), download_count))
+    fetches: dict[int, RemoteDeckFetch] = {}
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="sheets2anki-fetch"
+    ) as executor:
+        deck_futures = [
+            (
+                index,
+                executor.submit(
+                    fetch_remote_deck,
+                    remote_deck_configs[index],
+                    progress,
+                    from_snapshots,
+                ),
+            )
+            for index in deck_indices
+        ]
+        workbook_futures = [
+            (
+                indices,
+                executor.submit(
+                    fetch_workbook_decks,
+                    workbook_url,
+                    [remote_deck_configs[index] for index in indices],
+                    progress,
+                ),
+            )
+            for workbook_url, indices in workbook_indices.items()
+        ]
+        for index, future in deck_futures:
+            fetches[index] = future.result()
+        for indices, future in workbook_futures:
+            fetches.update(zip(indices, future.result()))
+    return [fetches[index] for index in range(len(remote_deck_configs))]
+
+
+def fetch_remote_deck(
+    remote_deck_config: RemoteDeckConfig,
+    progress: Optional[SyncProgress] = None,
+    from_snapshot: bool = False,
+) -> RemoteDeckFetch:
+    """Downloads and parses a single remote deck unless its sheet is unchanged.
+
+    Every successful download is kept as the snapshot of the deck. The snapshot
+    is used instead when the sheet cannot be reached.
+
+    Args:
+        remote_deck_config (RemoteDeckConfig): The deck to fetch, with the state of its last sync.
+        progress (SyncProgress, optional): Receives progress and signals cancellation. Defaults to None.
+        from_snapshot (bool, optional): Use the saved snapshot without downloading. Defaults to False.
+    Returns:
+        RemoteDeckFetch: The result. Errors, including cancellation, are captured rather than raised.
+    """
+    fetch = RemoteDeckFetch(remote_deck_config)
+    try:
+        if progress is not None:
+            progress.raise_if_cancelled()
+            progress.start_deck(remote_deck_config.deck_name)
+        if from_snapshot:
+            remote_csv = load_remote_deck_snapshot(remote_deck_config)
+            fetch.from_snapshot = True
+        else:
+            try:
+                # Without a snapshot, download in full once so one gets saved
+                if has_snapshot(remote_deck_config.url):
+                    remote_csv = download_remote_csv(
+                        remote_deck_config.url,
+                        remote_deck_config.etag,
+                        remote_deck_config.last_modified,
+                        remote_deck_config.content_length,
+                    )
+                else:
+                    remote_csv = download_remote_csv(
+                        remote_deck_config.url,
+                        prefix_length=remote_deck_config.content_length,
+                    )
+            except RemoteCsvUnavailableError:
+                # Offline or timed out, fall back to the last known sheet
+                if not has_snapshot(remote_deck_config.url):
+                    raise
+                remote_csv = load_remote_deck_snapshot(remote_deck_config)
+                fetch.from_snapshot = True
+
+        if remote_csv is not None:
+            parse_fetched_csv(fetch, remote_csv, progress)
+        # Otherwise the server reports that the sheet has not changed
+    except Exception as e:
+        fetch.error = e
+    finally:
+        if progress is not None:
+            progress.finish_deck()
+    return fetch
+
+
+def fetch_workbook_decks(
+    workbook_url: str,
+    remote_deck_configs: list[RemoteDeckConfig],
+    progress: Optional[SyncProgress] = None,
+) -> list[RemoteDeckFetch]:
+    """Downloads a spreadsheet once and parses the tab of each of its decks.
+
+    Each tab is turned into the CSV it would have been published as, which is
+    then handled like the download of a single deck: it becomes the snapshot
+    of the deck, and is only parsed if it changed. A deck falls back to its
+    snapshot when the spreadsheet cannot be reached.
+
+    Args:
+        workbook_url (str): The URL of the xlsx export of the spreadsheet, see get_workbook_url.
+        remote_deck_configs (list[RemoteDeckConfig]): The decks read from its tabs.
+        progress (SyncProgress, optional): Receives progress and signals cancellation. Defaults to None.
+    Returns:
+        list[RemoteDeckFetch]: One result per deck, in the order of remote_deck_configs.
+            Errors, including cancellation, are captured rather than raised.
+    """
+    fetches = [RemoteDeckFetch(config) for config in remote_deck_configs]
+    remote_xlsx = None
+    workbook = None
+    download_error = None
+    try:
+        if progress is not None:
+            progress.raise_if_cancelled()
+        # Only conditional if every deck was last synced from the same download
+        validators = {
+            (config.etag, config.last_modified) for config in remote_deck_configs
+        }
+        if len(validators) == 1 and all(
+            has_snapshot(config.url) for config in remote_deck_configs
+        ):
+            etag, last_modified = validators.pop()
+            remote_xlsx = download_remote_csv(workbook_url, etag, last_modified)
+            if remote_xlsx is None:
+                # The server reports that no tab has changed
+                for _ in fetches:
+                    if progress is not None:
+                        progress.finish_deck()
+                return fetches
+        else:
+            remote_xlsx = download_remote_csv(workbook_url)
+        workbook = Workbook(remote_xlsx.body)
+    except Exception as e:
+        download_error = e
+    offline = isinstance(download_error, RemoteCsvUnavailableError)
+
+    try:
+        for fetch in fetches:
+            remote_deck_config = fetch.remote_deck_config
+            try:
+                if progress is not None:
+                    progress.raise_if_cancelled()
+                    progress.start_deck(remote_deck_config.deck_name)
+                if workbook is not None:
+                    remote_csv = workbook.extract_sheet(
+                        remote_deck_config.sheet_name,
+                        remote_deck_config.content_length,
+                    )
+                    remote_csv.etag = remote_xlsx.etag
+                    remote_csv.last_modified = remote_xlsx.last_modified
+                elif offline and has_snapshot(remote_deck_config.url):
+                    # Offline or timed out, fall back to the last known sheet
+                    remote_csv = load_remote_deck_snapshot(remote_deck_config)
+                    fetch.from_snapshot = True
+                else:
+                    raise download_error
+                parse_fetched_csv(fetch, remote_csv, progress)
+            except Exception as e:
+                fetch.error = e
+            finally:
+                if progress is not None:
+                    progress.finish_deck()
+    finally:
+        if workbook is not None:
+            workbook.close()
+        if remote_xlsx is not None:
+            remote_xlsx.close()
+    return fetches
+
+
+def parse_fetched_csv(
+    fetch: RemoteDeckFetch,
+    remote_csv: RemoteCsv,
+    progress: Optional[SyncProgress] = None,
+) -> None:
+    """Saves a downloaded CSV as the snapshot of its deck and parses it if it changed.
+
+    When the sheet starts with exactly the bytes synced last time, only the
+    rows after them are parsed.
+
+    Args:
+        fetch (RemoteDeckFetch): The fetch of the deck, filled in with the result.
+        remote_csv (RemoteCsv): The download or snapshot. It is closed afterwards.
+        progress (SyncProgress, optional): Receives progress and signals cancellation. Defaults to None.
+    """
+    remote_deck_config = fetch.remote_deck_config
+    if not fetch.from_snapshot:
+        fetch.validators = (remote_csv.etag, remote_csv.last_modified)
+    with closing(remote_csv):
+        unchanged = remote_csv.content_hash == remote_deck_config.content_hash
+        if not fetch.from_snapshot and (
+            not unchanged or not has_snapshot(remote_deck_config.url)
+        ):
+            try:
+                save_snapshot(remote_deck_config.url, remote_csv)
+            except OSError as e:
+                # A missing snapshot must not stop the deck from syncing
+                logger.warning("Could not save the snapshot of the deck: %s", e)
+
+        if unchanged:
+            # The sheet is byte-identical to the one synced last time
+            return
+
+        previous_row_hashes = load_row_hashes(
+            remote_deck_config.url, remote_deck_config.config_hash
+        )
+        remote_deck = None
+        if (
+            previous_row_hashes is not None
+            and remote_csv.prefix_hash is not None
+            and remote_csv.prefix_hash == remote_deck_config.content_hash
+        ):
+            # Rows were only appended, so only they need parsing
+            remote_deck = build_appended_remote_deck(
+                remote_csv,
+                remote_deck_config.note_type,
+                remote_deck_config.note_type_fields,
+                remote_deck_config.content_length,
+                progress,
+                remote_deck_config.encoding,
+                remote_deck_config.tags_column,
+                remote_deck_config.tag_separator,
+                remote_deck_config.column_mapping,
+            )
+        if remote_deck is not None:
+            fetch.append_only = True
+            fetch.remote_deck_diff = diff_appended_rows(
+                remote_deck,
+                remote_deck_config.notecard_key_field,
+                previous_row_hashes,
+            )
+        else:
+            remote_deck = build_remote_deck_from_remote_csv(
+                remote_csv,
+                remote_deck_config.note_type,
+                remote_deck_config.note_type_fields,
+                progress,
+                remote_deck_config.encoding,
+                remote_deck_config.tags_column,
+                remote_deck_config.tag_separator,
+                remote_deck_config.column_mapping,
+            )
+            fetch.remote_deck_diff = diff_remote_deck(
+                remote_deck,
+                remote_deck_config.notecard_key_field,
+                previous_row_hashes,
+            )
+    remote_deck.deck_name = remote_deck_config.deck_name
+    fetch.remote_deck = remote_deck
+    fetch.content_hash = remote_csv.content_hash
+    fetch.content_length = remote_csv.content_length
+
+
+def load_remote_deck_snapshot(remote_deck_config: RemoteDeckConfig) -> RemoteCsv:
+    """Opens the snapshot of a remote deck.
+
+    Args:
+        remote_deck_config (RemoteDeckConfig): The deck whose snapshot to open.
+    Returns:
+        RemoteCsv: The snapshot. The caller must close it.
+    """
+    remote_csv = load_snapshot(remote_deck_config.url)
+    if remote_csv is None:
+        raise Exception("No offline snapshot of this deck has been saved yet.")
+    return remote_csv
@@ -0,0 +1,170 @@
+"""Shared HTTP client used for every network request made by the add-on.
+
+One pooled `requests.Session` is kept per host, so consecutive requests to
+docs.google.com or to the local AnkiConnect port reuse keep-alive connections
+instead of opening a new one each time. Requests get connect/read timeouts and
+are retried with exponential backoff and jitter on 429 and 5xx responses.
+Requests that must not run twice, such as the AnkiConnect POSTs, are only
+retried when no connection could be made.
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+DEFAULT_SETTINGS = {
+    "connect-timeout": 5,
+    "read-timeout": 30,
+    "max-retries": 3,
+    "backoff-factor": 0.5,
+    "max-backoff": 30,
+    "pool-size": 10,
+}
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Methods that can be sent again without changing the outcome
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"}
+
+_settings = dict(DEFAULT_SETTINGS)
+_sessions: dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def configure(settings: Optional[dict] = None) -> None:
+    """Applies the "http" section of the add-on config.
+
+    Args:
+        settings (dict, optional): Overrides for DEFAULT_SETTINGS. Defaults to None.
+    """
+    global _settings
+    new_settings = dict(DEFAULT_SETTINGS)
+    new_settings.update(settings or {})
+    if new_settings["pool-size"] != _settings["pool-size"]:
+        close_sessions()
+    _settings = new_settings
+
+
+def get_session(url: str) -> requests.Session:
+    """Returns the pooled session for the host of a URL, creating it if needed.
+
+    Args:
+        url (str): Any URL on the host.
+    Returns:
+        requests.Session: The session shared by all requests to that host.
+    """
+    parts = urlsplit(url)
+    host = f"{parts.scheme}://{parts.netloc}"
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            # Retries are handled in request() so Retry-After can be honored
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=_settings["pool-size"],
+                max_retries=0,
+            )
+            session.mount(f"{parts.scheme}://", adapter)
+            _sessions[host] = session
+        return session
+
+
+def close_sessions() -> None:
+    """Closes every pooled session and its open connections."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    """Sends a request through the pooled session of its host.
+
+    Connections that could not be made are retried up to "max-retries" times,
+    and so are responses with a 429 or 5xx status and connections dropped
+    mid-request, for idempotent methods only. The last response is returned as
+    is, so callers still decide what to do with an error status.
+
+    Args:
+        method (str): The HTTP method.
+        url (str): The URL to request.
+        **kwargs: Passed on to `requests.Session.request`.
+    Returns:
+        requests.Response: The final response.
+    """
+    kwargs.setdefault(
+        "timeout", (_settings["connect-timeout"], _settings["read-timeout"])
+    )
+    session = get_session(url)
+    max_retries = _settings["max-retries"]
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+
+    attempt = 0
+    while True:
+        try:
+            response = session.request(method, url, **kwargs)
+        except requests.ConnectionError as e:
+            # A dropped connection may come after the server got the request
+            if attempt >= max_retries or not (idempotent or _is_connect_error(e)):
+                raise
+            time.sleep(_backoff_delay(attempt))
+        else:
+            if (
+                not idempotent
+                or response.status_code not in RETRY_STATUS_CODES
+                or attempt >= max_retries
+            ):
+                return response
+            delay = _retry_after_delay(response)
+            if delay is None:
+                delay = _backoff_delay(attempt)
+            response.close()
+            time.sleep(delay)
+        attempt += 1
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """Sends a GET request through the shared client."""
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, data=None, **kwargs) -> requests.Response:
+    """Sends a POST request through the shared client."""
+    return request("POST", url, data=data, **kwargs)
+
+
+def _is_connect_error(error: requests.ConnectionError) -> bool:
+    """Tells whether a request failed before any connection to the server was made."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter, capped at "max-backoff" seconds."""
+    delay = min(_settings["max-backoff"], _settings["backoff-factor"] * 2**attempt)
+    return random.uniform(0, delay)
+
+
+def _retry_after_delay(response: requests.Response) -> Optional[float]:
+    """Reads the Retry-After header, given either in seconds or as an HTTP date."""
+    retry_after = response.headers.get("Retry-After")
+    if not retry_after:
+        return None
+    try:
+        delay = float(retry_after)
+    except ValueError:
+        try:
+            delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(_settings["max-backoff"], max(0.0, delay))
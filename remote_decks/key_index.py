@@ -0,0 +1,215 @@
+import hashlib
+import unicodedata
+from typing import Iterable, Optional
+
+from anki.collection import Collection
+from anki.utils import base91, field_checksum, ids2str
+
+from .note_tags import get_tag_set
+
+# Number of GUIDs or checksums looked up per query, well below SQLite's limit on
+# parameters
+LOOKUP_QUERY_SIZE = 500
+
+
+def compute_note_hash(fields: list[str], tags: Iterable[str]) -> str:
+    """Computes a digest of the fields and tags of a note.
+
+    The digest of a note read from the notes table and the digest of the row it
+    was written from are equal as long as the row has not changed, since Anki
+    stores field text in NFC form and compares tags as a set, ignoring case.
+    The digest of the fields comes first, so a row without tags can still be
+    compared with it, see is_note_unchanged.
+
+    Args:
+        fields (list[str]): The values of the fields, in the order of the note type.
+        tags (Iterable[str]): The tags of the note.
+    Returns:
+        str: The hex SHA-1 digests of the fields and of the tags, one after the other.
+    """
+    tags_data = " ".join(sorted(get_tag_set(tags)))
+    tags_hash = hashlib.sha1(tags_data.encode("utf-8")).hexdigest()
+    return compute_fields_hash(fields) + tags_hash
+
+
+def compute_fields_hash(fields: list[str]) -> str:
+    """Computes the part of a note hash that covers its fields.
+
+    Args:
+        fields (list[str]): The values of the fields, in the order of the note type.
+    Returns:
+        str: The hex SHA-1 digest of the fields.
+    """
+    data = "\x1f".join(unicodedata.normalize("NFC", value) for value in fields)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def is_note_unchanged(
+    note_hash: Optional[str], fields: list[str], tags: Optional[Iterable[str]]
+) -> bool:
+    """Checks whether writing a row would leave its note as it is.
+
+    Args:
+        note_hash (str, optional): The hash of the note, see compute_note_hash.
+        fields (list[str]): The values of the row, in the order of the note type.
+        tags (Iterable[str], optional): The tags of the row, or None if the sheet has no tags
+            column and the tags of the note are left alone.
+    Returns:
+        bool: True if the note is known to already hold the row.
+    """
+    if note_hash is None:
+        return False
+    if tags is None:
+        fields_hash = compute_fields_hash(fields)
+        return note_hash[: len(fields_hash)] == fields_hash
+    return note_hash == compute_note_hash(fields, tags)
+
+
+def build_key_index(
+    col: Collection,
+    deck_id: int,
+    notecard_key_field: str,
+    keys: Optional[Iterable[str]] = None,
+) -> dict[str, tuple[int, str, int]]:
+    """Maps the key of every note in a deck to its id, in a single query.
+
+    Only the raw `flds`, `tags` and `mod` columns are read, instead of loading a full
+    Note object for every note of the deck just to look at its key field. Like
+    a `deck:"name"` search, notes in subdecks, and notes whose cards sit in a
+    filtered deck, are included. Notes whose note type has no field named
+    notecard_key_field are skipped.
+
+    Args:
+        col (Collection): The Anki collection.
+        deck_id (int): The ID of the deck.
+        notecard_key_field (str): The field used as a unique key for notecards.
+        keys (Iterable[str], optional): Only map these keys. Defaults to every key.
+    Returns:
+        dict[str, tuple[int, str, int]]: (note id, note hash, modification time) by key,
+            see compute_note_hash.
+    """
+    if keys is not None:
+        keys = set(keys)
+    deck_ids = ids2str(col.decks.deck_and_child_ids(deck_id))
+    rows = col.db.all(
+        "select distinct n.id, n.mid, n.flds, n.tags, n.mod from notes n "
+        "join cards c on c.nid = n.id "
+        f"where c.did in {deck_ids} or c.odid in {deck_ids}"
+    )
+
+    # Ordinal of the key field, by note type id
+    key_ords: dict[int, int] = {}
+    key_index = {}
+    for nid, mid, flds, tags, mod in rows:
+        if mid not in key_ords:
+            model = col.models.get(mid)
+            field_map = col.models.field_map(model) if model else {}
+            key_ords[mid] = (
+                field_map[notecard_key_field][0]
+                if notecard_key_field in field_map
+                else -1
+            )
+        key_ord = key_ords[mid]
+        if key_ord < 0:
+            continue  # Skip notes without the specified key field
+
+        fields = flds.split("\x1f")
+        if keys is not None and fields[key_ord] not in keys:
+            continue
+        key_index[fields[key_ord]] = (
+            nid,
+            compute_note_hash(fields, tags.split()),
+            mod,
+        )
+    return key_index
+
+
+def compute_note_guid(url: str, key: str) -> str:
+    """Derives a stable note GUID from a remote deck and the key of a row.
+
+    Args:
+        url (str): The URL of the remote deck.
+        key (str): The value of the key field of the row.
+    Returns:
+        str: A base91-encoded 64-bit GUID, in the same format as Anki's own.
+    """
+    digest = hashlib.sha1(f"{url}\x1f{key}".encode("utf-8")).digest()
+    return base91(int.from_bytes(digest[:8], "big"))
+
+
+def find_notes_by_guid(
+    col: Collection, url: str, keys: Iterable[str]
+) -> dict[str, tuple[int, str, int]]:
+    """Finds the notes created for some keys of a remote deck with derived GUIDs.
+
+    The GUID column is indexed, so this does not depend on which deck the
+    notes are in.
+
+    Args:
+        col (Collection): The Anki collection.
+        url (str): The URL of the remote deck.
+        keys (Iterable[str]): The keys to look up.
+    Returns:
+        dict[str, tuple[int, str, int]]: (note id, note hash, modification time) of the
+            keys that have a note, see compute_note_guid.
+    """
+    keys_by_guid = {compute_note_guid(url, key): key for key in keys}
+    guids = list(keys_by_guid)
+    key_index = {}
+    for start in range(0, len(guids), LOOKUP_QUERY_SIZE):
+        chunk = guids[start : start + LOOKUP_QUERY_SIZE]
+        rows = col.db.all(
+            "select id, guid, flds, tags, mod from notes "
+            f"where guid in ({', '.join('?' * len(chunk))})",
+            *chunk,
+        )
+        for nid, guid, flds, tags, mod in rows:
+            key_index[keys_by_guid[guid]] = (
+                nid,
+                compute_note_hash(flds.split("\x1f"), tags.split()),
+                mod,
+            )
+    return key_index
+
+
+def find_notes_by_key_checksum(
+    col: Collection, deck_id: int, model_id: int, keys: Iterable[str]
+) -> dict[str, tuple[int, str, int]]:
+    """Finds the notes of a deck with some keys, when the key is the first field.
+
+    Anki keeps an indexed checksum of the first field of every note, so only the
+    candidates with a matching checksum are read instead of the whole deck.
+    Candidates are then compared on the field itself, since checksums collide.
+
+    Args:
+        col (Collection): The Anki collection.
+        deck_id (int): The ID of the deck, whose subdecks are included like in build_key_index.
+        model_id (int): The ID of the note type, whose first field is the key field.
+        keys (Iterable[str]): The keys to look up.
+    Returns:
+        dict[str, tuple[int, str, int]]: (note id, note hash, modification time) of the
+            keys that have a note.
+    """
+    keys = set(keys)
+    checksums = list({field_checksum(key) for key in keys})
+    deck_ids = ids2str(col.decks.deck_and_child_ids(deck_id))
+    key_index = {}
+    for start in range(0, len(checksums), LOOKUP_QUERY_SIZE):
+        chunk = checksums[start : start + LOOKUP_QUERY_SIZE]
+        rows = col.db.all(
+            "select distinct n.id, n.flds, n.tags, n.mod from notes n "
+            "join cards c on c.nid = n.id "
+            f"where n.csum in ({', '.join('?' * len(chunk))}) and n.mid = ? "
+            f"and (c.did in {deck_ids} or c.odid in {deck_ids})",
+            *chunk,
+            model_id,
+        )
+        for nid, flds, tags, mod in rows:
+            fields = flds.split("\x1f")
+            if fields[0] in keys:
+                key_index[fields[0]] = (
+                    nid,
+                    compute_note_hash(fields, tags.split()),
+                    mod,
+                )
+    return key_index
@@ -0,0 +1,119 @@
+"""Detection of rows whose key was edited in the sheet.
+
+When the key of a row changes, for instance to fix a typo, the old key looks
+removed and the new one added. Pairing them up lets the existing note be
+updated in place, which keeps its cards and their review history instead of
+deleting the note and creating a new one.
+"""
+
+import difflib
+import unicodedata
+from typing import Sequence
+
+from anki.collection import Collection
+from anki.utils import ids2str
+
+from .models.note_template import NoteTemplate
+
+# Non-key fields of a removed note and an added row must be at least this
+# similar, as a difflib ratio, for the row to be taken as a renamed key
+DEFAULT_RENAME_SIMILARITY = 0.9
+
+# Fuzzy matching compares every added row with every removed note, so it is
+# skipped when there are more pairs than this
+MAX_SIMILARITY_COMPARISONS = 20000
+
+
+def find_renamed_keys(
+    col: Collection,
+    template: NoteTemplate,
+    notecard_key_field: str,
+    removed_notes: dict[str, int],
+    added_notecards: dict[str, Sequence[str]],
+    similarity: float = DEFAULT_RENAME_SIMILARITY,
+) -> list[tuple[str, str]]:
+    """Pairs the keys gone from the sheet with new keys that hold the same content.
+
+    Rows whose non-key fields are identical to those of a removed note are
+    paired first. The rest are paired with the most similar removed note, if
+    their similarity reaches the threshold. Only notes of the deck's note type
+    are considered, and rows whose non-key fields are all empty never match.
+
+    Args:
+        col (Collection): The Anki collection.
+        template (NoteTemplate): The prepared template of the deck.
+        notecard_key_field (str): The field used as a unique key for notecards.
+        removed_notes (dict[str, int]): Note id by key, for the keys gone from the sheet.
+        added_notecards (dict[str, Sequence[str]]): Values by key, in CSV column order, for
+            the keys with no note.
+        similarity (float, optional): Minimum similarity of a fuzzy match, 1 to only pair
+            identical content. Defaults to DEFAULT_RENAME_SIMILARITY.
+    Returns:
+        list[tuple[str, str]]: (old key, new key) pairs.
+    """
+    if not removed_notes or not added_notecards:
+        return []
+
+    key_column = template.field_names.index(notecard_key_field)
+    other_ords = [
+        field_ord
+        for column, field_ord in enumerate(template.field_ords)
+        if column != key_column
+    ]
+
+    # Non-key content of the removed notes, in CSV column order
+    keys_by_nid = {nid: key for key, nid in removed_notes.items()}
+    removed_texts: dict[str, str] = {}
+    for nid, mid, flds in col.db.all(
+        "select id, mid, flds from notes where id in " + ids2str(keys_by_nid)
+    ):
+        if mid != template.model["id"]:
+            continue
+        fields = flds.split("\x1f")
+        text = "\x1f".join(fields[field_ord] for field_ord in other_ords)
+        if text.strip("\x1f").strip():
+            removed_texts[keys_by_nid[nid]] = text
+
+    added_texts: dict[str, str] = {}
+    for key, values in added_notecards.items():
+        other_values = [
+            value for column, value in enumerate(values) if column != key_column
+        ]
+        text = unicodedata.normalize("NFC", "\x1f".join(other_values))
+        if text.strip("\x1f").strip():
+            added_texts[key] = text
+
+    # Identical content first
+    old_keys_by_text: dict[str, list[str]] = {}
+    for old_key, text in removed_texts.items():
+        old_keys_by_text.setdefault(text, []).append(old_key)
+    renames = []
+    for new_key, text in list(added_texts.items()):
+        old_keys = old_keys_by_text.get(text)
+        if old_keys:
+            old_key = old_keys.pop(0)
+            renames.append((old_key, new_key))
+            del removed_texts[old_key]
+            del added_texts[new_key]
+
+    comparisons = len(removed_texts) * len(added_texts)
+    if similarity >= 1 or comparisons > MAX_SIMILARITY_COMPARISONS:
+        return renames
+
+    # Then the most similar content, cheapest bounds first
+    for new_key, text in added_texts.items():
+        matcher = difflib.SequenceMatcher(None, b=text, autojunk=False)
+        best_key, best_ratio = None, similarity
+        for old_key, old_text in removed_texts.items():
+            matcher.set_seq1(old_text)
+            if (
+                matcher.real_quick_ratio() >= best_ratio
+                and matcher.quick_ratio() >= best_ratio
+            ):
+                ratio = matcher.ratio()
+                if ratio >= best_ratio:
+                    best_key, best_ratio = old_key, ratio
+        if best_key is not None:
+            renames.append((best_key, new_key))
+            del removed_texts[best_key]
+    return renames
@@ -4,8 +4,19 @@ try:
 except:
     pass
 
+# Reuse keep-alive connections to AnkiConnect through the shared pooled client
+# of the sheets2anki add-on when bundled with it
+try:
+    from ....http_client import post as httpPost
+except (ImportError, ValueError):
+    def httpPost(url, data=None):
+        return requests.post(url, data)
+
 import json
-import copy
+import logging
+
+# Child of the sheets2anki logger, so messages follow its level and log window
+logger = logging.getLogger("sheets2anki.org_to_anki")
 
 
 class AnkiConnectorUtils:
@@ -16,19 +27,20 @@ class AnkiConnectorUtils:
     def makeRequest(self, action, parmeters = {}): # (str, dict)
 
         payload = self._buildPayload(action, parmeters)
-        if payload.get("action") != "storeMediaFile":
-            print("Parameters sent to Anki", payload, "\n")
-        else:
-            truncateMediaEncoding = copy.deepcopy(payload)
-            truncateMediaEncoding.get("params")["data"] = 'encoding remvoed for print statement'
-            print("Parameters sent to Anki", truncateMediaEncoding, "\n")
+        if logger.isEnabledFor(logging.DEBUG):
+            if payload.get("action") != "storeMediaFile":
+                logger.debug("Parameters sent to Anki %s", payload)
+            else:
+                # Only the media data is left out, no need to copy the rest
+                truncateMediaEncoding = dict(payload)
+                truncateMediaEncoding["params"] = dict(payload.get("params"), data='encoding removed for log message')
+                logger.debug("Parameters sent to Anki %s", truncateMediaEncoding)
 
         payload = json.dumps(payload)
-        # TODO log payloads
         try:
-            res = requests.post(self.url, payload)
+            res = httpPost(self.url, payload)
         except Exception as e:
-            print("An error has occurred make the request.\n", e)
+            logger.error("An error has occurred make the request: %s", e)
 
         if res.status_code == 200:
             data = json.loads(res.text)
@@ -59,7 +71,7 @@ class AnkiConnectorUtils:
     def testConnection(self):
         try:
             # TODO log status code
-            return requests.post(self.url, data={}).status_code == 200
+            return httpPost(self.url, data={}).status_code == 200
         except requests.exceptions.RequestException:
             # TODO log exception
             return False
@@ -6,6 +6,10 @@ from . import DeckBuilderUtils
 from . import ParserUtils
 
 import os
+import logging
+
+# Child of the sheets2anki logger, so messages follow its level and log window
+logger = logging.getLogger("sheets2anki.org_to_anki")
 
 
 class DeckBuilder:
@@ -225,7 +229,7 @@ class DeckBuilder:
                         codeSection.append(codeLine)
                 questionFactory.addCode(language, codeSection) 
             else:
-                print("Current line is not recognised: {}".format(line.encode("utf-8")))
+                logger.debug("Current line is not recognised: %r", line)
         
         # Add last question
         if questionFactory.isValidQuestion():
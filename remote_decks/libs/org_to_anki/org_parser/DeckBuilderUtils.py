@@ -6,6 +6,10 @@ from .. import config
 import os
 import re
 import hashlib
+import logging
+
+# Child of the sheets2anki logger, so messages follow its level and log window
+logger = logging.getLogger("sheets2anki.org_to_anki")
 
 class DeckBuilderUtils:
 
@@ -27,8 +31,8 @@ class DeckBuilderUtils:
             # Image from urls will be lazy loaded
             if "http" in answerLine or "www." in answerLine:
                 if "[image=" in answerLine:
-                    print("Trying to get image using: {}".format(answerLine.encode("utf-8")))
-                    print("lazyLoading is currently: {}".format(config.lazyLoadImages))
+                    logger.debug("Trying to get image using: %r", answerLine)
+                    logger.debug("lazyLoading is currently: %s", config.lazyLoadImages)
 
                     # TODO names should make some sense
                     potentialUrls = re.findall("\[image=[^]]+\]", answerLine.strip())
@@ -72,9 +76,9 @@ class DeckBuilderUtils:
                     return answerLine
 
                 else:
-                    print("Could not find image on line: {}".format(answerLine.encode("utf-8")))
+                    logger.warning("Could not find image on line: %r", answerLine)
             else:
-                print("Could not parse image from line: {}".format(answerLine.encode("utf-8")))
+                logger.warning("Could not parse image from line: %r", answerLine)
         
         return answerLine
     
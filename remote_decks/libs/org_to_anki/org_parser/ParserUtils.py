@@ -1,4 +1,10 @@
 
+# Prefer the shared pooled client of the sheets2anki add-on when bundled with it
+try:
+    from ....http_client import get as sharedGet
+except (ImportError, ValueError):
+    sharedGet = None
+
 # Get Anki sync or urllib2
 try:
     from anki.sync import AnkiRequestsClient
@@ -11,7 +17,10 @@ except:
 def getImageFromUrl(url):
 
     URL_TIMEOUT = 5
-    if anki == "set":
+    if sharedGet is not None:
+        resp = sharedGet(url)
+        content = resp.content
+    elif anki == "set":
         client = AnkiRequestsClient()
         client.timeout = URL_TIMEOUT
         resp = client.get(url)
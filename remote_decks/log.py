@@ -0,0 +1,90 @@
+"""Logging for the add-on.
+
+Every module logs through a child of the "sheets2anki" logger. Messages take
+their arguments separately, so a message below the configured level costs no
+formatting at all. Those that get through are printed to the console and
+kept in a bounded ring buffer, formatted only when the log window shows them.
+The level follows the "debug" key of the config.
+"""
+
+import logging
+import sys
+from collections import deque
+from typing import Optional
+
+LOGGER_NAME = "sheets2anki"
+
+# Number of messages kept for the log window
+LOG_BUFFER_SIZE = 2000
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the last records logged, without formatting them."""
+
+    def __init__(self, capacity: int):
+        super().__init__()
+        self.records: deque[logging.LogRecord] = deque(maxlen=capacity)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+    def get_lines(self) -> list[str]:
+        """Formats the records kept, oldest first.
+
+        Returns:
+            list[str]: One formatted message per record.
+        """
+        # Records are appended from the fetch threads too
+        with self.lock:
+            records = list(self.records)
+        lines = []
+        for record in records:
+            try:
+                lines.append(self.format(record))
+            except Exception:
+                lines.append(f"Could not format message: {record.msg!r}")
+        return lines
+
+    def clear(self) -> None:
+        with self.lock:
+            self.records.clear()
+
+
+ring_buffer = RingBufferHandler(LOG_BUFFER_SIZE)
+ring_buffer.setFormatter(logging.Formatter(LOG_FORMAT))
+
+# Per-row messages are only kept for the log window, not printed
+console_handler = logging.StreamHandler(sys.stdout)
+console_handler.setLevel(logging.INFO)
+console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+
+def get_logger(module_name: str) -> logging.Logger:
+    """Returns the logger of a module of the add-on.
+
+    Args:
+        module_name (str): The __name__ of the module.
+    Returns:
+        logging.Logger: A child of the add-on's logger named after the module.
+    """
+    return logging.getLogger(f"{LOGGER_NAME}.{module_name.rsplit('.', 1)[-1]}")
+
+
+def configure_logging(config: Optional[dict]) -> None:
+    """Sets the level of the add-on's logger from its config.
+
+    Can be called again whenever the config changes.
+
+    Args:
+        config (dict, optional): The add-on config. Its "debug" key enables debug messages.
+    """
+    debug = bool((config or {}).get("debug", False))
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(logging.DEBUG if debug else logging.INFO)
+    # Keep the messages of the add-on out of Anki's own log
+    logger.propagate = False
+    for handler in (ring_buffer, console_handler):
+        if handler not in logger.handlers:
+            logger.addHandler(handler)
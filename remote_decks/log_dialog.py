@@ -0,0 +1,81 @@
+from typing import Optional
+
+from aqt import mw
+from aqt.qt import (
+    QApplication,
+    QDialog,
+    QHBoxLayout,
+    QPlainTextEdit,
+    QPushButton,
+    QVBoxLayout,
+    QWidget,
+)
+from aqt.utils import qconnect
+
+from .log import LOG_BUFFER_SIZE, ring_buffer
+
+
+class LogDialog(QDialog):
+    """Window showing the last messages logged by the add-on."""
+
+    def __init__(self, parent: QWidget):
+        super().__init__(parent)
+
+        self.setWindowTitle("sheets2anki Log")
+        self.resize(800, 500)
+
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setMaximumBlockCount(LOG_BUFFER_SIZE)
+
+        refresh_button = QPushButton("Refresh")
+        qconnect(refresh_button.clicked, self.refresh)
+        copy_button = QPushButton("Copy")
+        qconnect(copy_button.clicked, self.copy)
+        clear_button = QPushButton("Clear")
+        qconnect(clear_button.clicked, self.clear)
+        close_button = QPushButton("Close")
+        qconnect(close_button.clicked, self.accept)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(refresh_button)
+        buttons.addWidget(copy_button)
+        buttons.addWidget(clear_button)
+        buttons.addStretch()
+        buttons.addWidget(close_button)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.text)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Shows the messages logged so far, scrolled to the most recent."""
+        self.text.setPlainText("\n".join(ring_buffer.get_lines()))
+        scroll_bar = self.text.verticalScrollBar()
+        scroll_bar.setValue(scroll_bar.maximum())
+
+    def copy(self) -> None:
+        QApplication.clipboard().setText(self.text.toPlainText())
+
+    def clear(self) -> None:
+        ring_buffer.clear()
+        self.refresh()
+
+
+# The open window, kept so it is not garbage collected
+_log_dialog: Optional[LogDialog] = None
+
+
+def show_log_dialog() -> None:
+    """Opens the log window, or brings it to the front with fresh messages."""
+    global _log_dialog
+    if _log_dialog is None:
+        _log_dialog = LogDialog(mw)
+    else:
+        _log_dialog.refresh()
+    _log_dialog.show()
+    _log_dialog.raise_()
+    _log_dialog.activateWindow()
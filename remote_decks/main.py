@@ -1,63 +1,527 @@
-from anki.collection import Collection
+import hashlib
+import json
+import traceback
+from concurrent.futures import Future
+from typing import Callable, Generator, Iterable, Optional, TypeVar
+
+from anki.collection import AddNoteRequest, Collection
+from anki.notes import Note
 from aqt import mw
-from aqt.qt import QInputDialog, QLineEdit
-from aqt.utils import showInfo
+from aqt.qt import QInputDialog, QLineEdit, QTimer
+from aqt.utils import showInfo, tooltip
 
+from . import http_client
+from .log import get_logger
+from .models.note_change_counts import NoteChangeCounts
 from .models.remote_deck import RemoteDeck
 from .models.remote_deck_config import RemoteDeckConfig
+from .models.remote_deck_diff import RemoteDeckDiff
+from .models.remote_deck_fetch import RemoteDeckFetch
+from .models.sync_progress import SyncCancelled, SyncProgress
+from .models.sync_summary import SyncSummary
+from .sync_progress_dialog import SyncProgressDialog
 
 try:
     echo_mode_normal = QLineEdit.EchoMode.Normal
 except AttributeError:
     echo_mode_normal = QLineEdit.Normal
 
-from .parse_remote_deck import get_remote_deck
+from .fetch_remote_decks import DEFAULT_MAX_CONCURRENT_FETCHES, fetch_remote_decks
+from .key_index import (
+    build_key_index,
+    compute_note_guid,
+    find_notes_by_guid,
+    find_notes_by_key_checksum,
+    is_note_unchanged,
+)
+from .key_renames import DEFAULT_RENAME_SIMILARITY, find_renamed_keys
+from .note_index import NoteIndex, forget_deck
+from .note_tags import DEFAULT_TAG_SEPARATOR, DEFAULT_TAGS_COLUMN
+from .note_template import fill_note, get_note_fields, new_note, prepare_note_template
+from .snapshots import delete_snapshot, save_row_hashes
+from .sync_undo import SyncUndoEntry
+
+logger = get_logger(__name__)
+
+# Number of notes sent to the collection per bulk add or update
+DEFAULT_WRITE_BATCH_SIZE = 500
+
+# Keys of a deck's config entry that a sync writes, as opposed to its settings
+SYNC_STATE_KEYS = (
+    "etag",
+    "last_modified",
+    "content_hash",
+    "content_length",
+    "config_hash",
+    "encoding",
+)
+
+# How long a quiet sync waits before checking again while the user is reviewing
+REVIEW_RETRY_SECONDS = 10
+
+T = TypeVar("T")
+
+# Set while a sync is running, so manual and automatic syncs never overlap
+_sync_running = False
+
+
+def is_sync_running() -> bool:
+    return _sync_running
+
+
+def sync_decks(
+    from_snapshots: bool = False,
+    deck_urls: Optional[Iterable[str]] = None,
+    quiet: bool = False,
+    on_done: Optional[Callable[[Optional[SyncSummary]], None]] = None,
+) -> None:
+    """Function to sync remote decks.
+
+    Downloading and parsing run in the background while a progress window is
+    shown. Only the collection writes are done on the main thread.
 
+    Args:
+        from_snapshots (bool, optional): Rebuild the decks from their saved snapshots
+            instead of downloading them. Defaults to False.
+        deck_urls (Iterable[str], optional): Only sync the decks with these URLs. Defaults to None.
+        quiet (bool, optional): Run without progress window and only report changes
+            and failures in a tooltip. Defaults to False.
+        on_done (Callable[[Optional[SyncSummary]], None], optional): Called on the main thread once
+            the sync is over, with None if it could not run or failed as a whole. Defaults to None.
+    """
+    global _sync_running
+    if _sync_running:
+        if not quiet:
+            showInfo("A synchronization is already running.")
+        if on_done is not None:
+            on_done(None)
+        return
 
-def sync_decks():
-    """Function to sync remote decks."""
-    col = mw.col
     config = mw.addonManager.getConfig(__name__)
     if not config:
         config = {"remote-decks": {}}
+    http_client.configure(config.get("http"))
+
+    remote_infos = list(config["remote-decks"].values())
+    if deck_urls is not None:
+        deck_urls = set(deck_urls)
+        remote_infos = [info for info in remote_infos if info["url"] in deck_urls]
+    remote_deck_configs = [load_remote_deck_config(info) for info in remote_infos]
+    max_workers = config.get("max-concurrent-fetches", DEFAULT_MAX_CONCURRENT_FETCHES)
+    batch_size = config.get("write-batch-size", DEFAULT_WRITE_BATCH_SIZE)
+    deterministic_guids = config.get("deterministic-guids", False)
+    rename_similarity = config.get("rename-similarity", DEFAULT_RENAME_SIMILARITY)
+
+    progress = SyncProgress()
+    if from_snapshots:
+        progress.start_phase("Reading snapshots...", len(remote_deck_configs))
+    else:
+        progress.start_phase("Downloading sheets...", len(remote_deck_configs))
+    dialog = None
+    if not quiet:
+        dialog = SyncProgressDialog(mw, progress)
+        dialog.show()
+
+    def fetch_in_background() -> list[RemoteDeckFetch]:
+        # Download and parse every deck concurrently, off the main thread
+        return fetch_remote_decks(
+            remote_deck_configs, max_workers, progress, from_snapshots
+        )
 
-    for deck_key in config["remote-decks"].keys():
+    def on_fetched(future: Future) -> None:
         try:
-            current_remote_info = config["remote-decks"][deck_key]
-
-            remote_deck_config = RemoteDeckConfig()
-            remote_deck_config.url = current_remote_info["url"]
-            remote_deck_config.deck_name = current_remote_info["deck_name"]
-            remote_deck_config.note_type = current_remote_info["note_type"]
-            remote_deck_config.note_type_fields = current_remote_info[
-                "note_type_fields"
-            ]
-            remote_deck_config.notecard_key_field = current_remote_info[
-                "notecard_key_field"
-            ]
-
-            remote_deck = get_remote_deck(
-                current_remote_info["url"],
-                remote_deck_config.note_type,
-                remote_deck_config.note_type_fields,
-            )
-            remote_deck.deck_name = remote_deck_config.deck_name
-            deck_id = get_or_create_deck(col, remote_deck_config.deck_name)
-            create_or_update_notes(
-                col,
-                remote_deck,
-                deck_id,
-                remote_deck_config.note_type,
-                remote_deck_config.notecard_key_field,
-            )
+            fetches = future.result()
         except Exception as e:
-            deck_message = (
-                f"\nThe following deck failed to sync: {remote_deck_config.deck_name}"
+            on_applied(None, e)
+            return
+        col = mw.col
+        steps = iter_apply_remote_deck_fetches(
+            col,
+            remote_infos,
+            fetches,
+            progress,
+            batch_size,
+            deterministic_guids,
+            rename_similarity,
+            is_deck_linked,
+        )
+        apply_next_chunk(col, steps)
+
+    def apply_next_chunk(
+        col: Collection, steps: Generator[None, None, SyncSummary]
+    ) -> None:
+        if mw.col is not col:
+            try:
+                # Runs the cleanup of the operation, which may fail on a closed collection
+                steps.close()
+            except Exception as e:
+                logger.warning("Could not finish the sync cleanly: %s", e)
+            on_applied(None, Exception("The collection was closed."))
+            return
+        if quiet and mw.state == "review":
+            # Never write to the collection under a study session
+            QTimer.singleShot(
+                REVIEW_RETRY_SECONDS * 1000, lambda: apply_next_chunk(col, steps)
             )
-            showInfo(str(e) + deck_message)
-            raise
+            return
+        try:
+            next(steps)
+        except StopIteration as stop:
+            on_applied(stop.value, None)
+            return
+        except Exception as e:
+            on_applied(None, e)
+            return
+        # Let Qt handle input and repaint the window before the next chunk
+        QTimer.singleShot(0, lambda: apply_next_chunk(col, steps))
+
+    def on_applied(summary: Optional[SyncSummary], error: Optional[Exception]) -> None:
+        global _sync_running
+        try:
+            if error is not None:
+                if dialog is not None:
+                    dialog.finish()
+                if quiet:
+                    tooltip(f"sheets2anki synchronization failed: {error}")
+                    return
+                showInfo(f"Synchronization failed:\n{error}")
+                if config.get("debug", False):
+                    showInfo(
+                        "".join(
+                            traceback.format_exception(
+                                type(error), error, error.__traceback__
+                            )
+                        )
+                    )
+                return
+        finally:
+            # Keep the sync state of the decks applied so far
+            save_sync_state(remote_infos)
+            _sync_running = False
+            if on_done is not None:
+                on_done(summary)
+
+        if dialog is not None:
+            dialog.finish()
+        reset_when_not_reviewing()
+        if not quiet:
+            showInfo(format_sync_summary(summary))
+        elif summary.synced_decks or summary.failed_decks:
+            tooltip(format_sync_summary(summary).replace("\n", "<br>"))
+
+    def reset_when_not_reviewing() -> None:
+        if mw.state == "review":
+            # Refreshing would interrupt the card being studied
+            QTimer.singleShot(REVIEW_RETRY_SECONDS * 1000, reset_when_not_reviewing)
+            return
+        mw.reset()
+
+    _sync_running = True
+    mw.taskman.run_in_background(fetch_in_background, on_fetched)
+
+
+def is_deck_linked(url: str) -> bool:
+    """Checks that a deck is still linked, since it may be unlinked during a sync.
+
+    Args:
+        url (str): The URL of the remote deck.
+    Returns:
+        bool: True if the add-on config still has an entry for the deck.
+    """
+    config = mw.addonManager.getConfig(__name__) or {}
+    return url in config.get("remote-decks", {})
+
+
+def save_sync_state(remote_infos: Iterable[dict]) -> None:
+    """Writes the sync state of some decks into the current add-on config.
+
+    The config is read again rather than written back as it was when the sync
+    started, so that settings edited and decks unlinked in the meantime are
+    kept. Only the SYNC_STATE_KEYS of decks that are still linked are updated.
+
+    Args:
+        remote_infos (Iterable[dict]): The config entries of the synced decks.
+    """
+    config = mw.addonManager.getConfig(__name__)
+    if not config:
+        config = {"remote-decks": {}}
+    remote_decks = config.setdefault("remote-decks", {})
+    for info in remote_infos:
+        current_info = remote_decks.get(info["url"])
+        if current_info is None:
+            continue
+        for key in SYNC_STATE_KEYS:
+            if key in info:
+                current_info[key] = info[key]
+    mw.addonManager.writeConfig(__name__, config)
+
+
+def run_to_completion(steps: Generator[None, None, T]) -> T:
+    """Runs every chunk of a chunked operation without yielding to Qt.
+
+    Args:
+        steps (Generator[None, None, T]): The chunked operation.
+    Returns:
+        T: The value returned by the operation.
+    """
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+
+def iter_apply_remote_deck_fetches(
+    col: Collection,
+    remote_infos: list[dict],
+    fetches: list[RemoteDeckFetch],
+    progress: SyncProgress,
+    batch_size: int = DEFAULT_WRITE_BATCH_SIZE,
+    deterministic_guids: bool = False,
+    rename_similarity: float = DEFAULT_RENAME_SIMILARITY,
+    is_linked: Optional[Callable[[str], bool]] = None,
+) -> Generator[None, None, SyncSummary]:
+    """Applies fetched decks to the collection, one after another, in chunks.
+
+    Must run on the main thread. The generator yields after every chunk of
+    batch_size rows and after every deck, once the work done so far is
+    committed, so the caller can hand control back to the Qt event loop. The
+    sync state of each deck is written to its entry in remote_infos once its
+    notes are up to date. The changes made to the collection are merged into
+    a single undo step, or a few if the user changed or undid something
+    between chunks (see SyncUndoEntry).
+
+    Args:
+        col (Collection): The Anki collection.
+        remote_infos (list[dict]): The config entries of the decks, in the order of fetches.
+        fetches (list[RemoteDeckFetch]): The results of the fetch stage.
+        progress (SyncProgress): Receives progress and signals cancellation.
+        batch_size (int, optional): Number of rows per chunk. Defaults to DEFAULT_WRITE_BATCH_SIZE.
+        deterministic_guids (bool, optional): Give new notes a GUID derived from the deck URL
+            and their key. Defaults to False.
+        rename_similarity (float, optional): Minimum similarity for a new key to be taken as
+            an edit of a removed one. Defaults to DEFAULT_RENAME_SIMILARITY.
+        is_linked (Callable[[str], bool], optional): Tells whether a deck URL is still
+            linked. Decks unlinked since they were fetched are left alone. Defaults to None.
+    Returns:
+        SyncSummary: What happened to each deck.
+    """
+    summary = SyncSummary()
+    undo_entry = SyncUndoEntry(col)
+    # Config entries of the decks applied under the current undo step
+    applied_infos: list[dict] = []
+
+    def forget_applied_state() -> None:
+        # The user may have undone them, so the next sync must not skip them
+        if undo_entry.interrupted:
+            for info in applied_infos:
+                for key in SYNC_STATE_KEYS:
+                    info[key] = None
+            applied_infos.clear()
+            undo_entry.interrupted = False
+
+    progress.start_phase("Updating notes...", len(fetches))
+
+    def on_row(rows_done: int, rows_total: int) -> None:
+        progress.set_rows(rows_done, rows_total)
+        progress.raise_if_cancelled()
+
+    try:
+        for current_remote_info, fetch in zip(remote_infos, fetches):
+            remote_deck_config = fetch.remote_deck_config
+            deck_name = remote_deck_config.deck_name
+            progress.start_deck(deck_name)
+            try:
+                progress.raise_if_cancelled()
+                if is_linked is not None and not is_linked(remote_deck_config.url):
+                    # The fetch may have saved a snapshot after the deck was unlinked
+                    delete_snapshot(remote_deck_config.url)
+                    continue
+                if fetch.error is not None:
+                    raise fetch.error
+
+                if fetch.from_snapshot:
+                    summary.offline_decks.append(deck_name)
+
+                remote_deck = fetch.remote_deck
+                if remote_deck is None:
+                    summary.skipped_decks.append(deck_name)
+                    if fetch.validators is not None:
+                        # Downloaded again with the same bytes, maybe under a new ETag
+                        etag, last_modified = fetch.validators
+                        current_remote_info["etag"] = etag
+                        current_remote_info["last_modified"] = last_modified
+                    continue
+
+                undo_entry.begin()
+                deck_id = get_or_create_deck(col, deck_name)
+                undo_entry.merge()
+                note_index = NoteIndex(
+                    col, remote_deck_config.url, remote_deck_config.config_hash
+                )
+                try:
+                    note_counts = yield from iter_create_or_update_notes(
+                        col,
+                        remote_deck,
+                        deck_id,
+                        remote_deck_config.note_type,
+                        remote_deck_config.notecard_key_field,
+                        on_row,
+                        fetch.remote_deck_diff,
+                        batch_size,
+                        undo_entry,
+                        note_index,
+                        remote_deck_config.url if deterministic_guids else None,
+                        rename_similarity,
+                        fetch.append_only,
+                    )
+                finally:
+                    note_index.close()
+                summary.synced_decks.append(deck_name)
+                summary.note_counts.add(note_counts)
+                try:
+                    save_row_hashes(
+                        remote_deck_config.url,
+                        remote_deck_config.config_hash,
+                        fetch.remote_deck_diff.row_hashes,
+                    )
+                except OSError as e:
+                    # The next sync then writes every row again, which is still correct
+                    logger.warning(
+                        "Could not save the row hashes of %s: %s", deck_name, e
+                    )
+
+                # Only remember the sync state once the notes are up to date
+                current_remote_info["etag"] = remote_deck.etag
+                current_remote_info["last_modified"] = remote_deck.last_modified
+                current_remote_info["content_hash"] = fetch.content_hash
+                current_remote_info["content_length"] = fetch.content_length
+                current_remote_info["config_hash"] = remote_deck_config.config_hash
+                current_remote_info["encoding"] = remote_deck.encoding
+                applied_infos.append(current_remote_info)
+                forget_applied_state()
+            except SyncCancelled:
+                summary.cancelled_decks.append(deck_name)
+            except Exception as e:
+                summary.failed_decks.append((deck_name, str(e)))
+                summary.failed_urls.append(remote_deck_config.url)
+            finally:
+                progress.finish_deck()
+            yield
+            undo_entry.resume()
+            forget_applied_state()
+    finally:
+        if mw.col is col:
+            # Changes interrupted before their merge still belong to the sync
+            undo_entry.merge()
+
+    return summary
+
+
+def load_remote_deck_config(current_remote_info: dict) -> RemoteDeckConfig:
+    """Builds a RemoteDeckConfig from its entry in the add-on config.
+
+    Args:
+        current_remote_info (dict): The entry of the deck in config["remote-decks"].
+    Returns:
+        RemoteDeckConfig: The deck configuration, with the state of its last sync.
+    """
+    remote_deck_config = RemoteDeckConfig()
+    remote_deck_config.url = current_remote_info["url"]
+    remote_deck_config.deck_name = current_remote_info["deck_name"]
+    remote_deck_config.note_type = current_remote_info["note_type"]
+    remote_deck_config.note_type_fields = current_remote_info["note_type_fields"]
+    remote_deck_config.notecard_key_field = current_remote_info["notecard_key_field"]
+    remote_deck_config.tags_column = current_remote_info.get(
+        "tags_column", DEFAULT_TAGS_COLUMN
+    )
+    remote_deck_config.tag_separator = current_remote_info.get(
+        "tag_separator", DEFAULT_TAG_SEPARATOR
+    )
+    remote_deck_config.sheet_name = current_remote_info.get("sheet_name")
+    remote_deck_config.column_mapping = current_remote_info.get("column_mapping")
+    remote_deck_config.config_hash = compute_config_hash(remote_deck_config)
+    remote_deck_config.encoding = current_remote_info.get("encoding")
+
+    # Anything recorded by the last sync is only valid for the same
+    # note type and key field, otherwise the deck has to be rebuilt
+    if current_remote_info.get("config_hash") == remote_deck_config.config_hash:
+        remote_deck_config.etag = current_remote_info.get("etag")
+        remote_deck_config.last_modified = current_remote_info.get("last_modified")
+        remote_deck_config.content_hash = current_remote_info.get("content_hash")
+        remote_deck_config.content_length = current_remote_info.get("content_length")
+
+    return remote_deck_config
+
 
-    showInfo("Synchronization complete")
+def compute_config_hash(remote_deck_config: RemoteDeckConfig) -> str:
+    """Computes a digest of the settings that shape the notes of a deck.
+
+    Args:
+        remote_deck_config (RemoteDeckConfig): The configuration of the remote deck.
+    Returns:
+        str: The hex SHA-256 digest of the note type, its fields, the key field, how
+            tags are read and the column mapping.
+    """
+    parts = [
+        remote_deck_config.note_type,
+        *remote_deck_config.note_type_fields,
+        remote_deck_config.notecard_key_field,
+    ]
+    tag_settings = [remote_deck_config.tags_column, remote_deck_config.tag_separator]
+    if tag_settings != [DEFAULT_TAGS_COLUMN, DEFAULT_TAG_SEPARATOR]:
+        # Only then, so decks linked before tags were read keep their sync state
+        parts += [str(setting) for setting in tag_settings]
+    if remote_deck_config.column_mapping is not None:
+        parts.append(json.dumps(remote_deck_config.column_mapping, sort_keys=True))
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def format_sync_summary(summary: SyncSummary) -> str:
+    """Formats the message shown to the user at the end of a sync.
+
+    Args:
+        summary (SyncSummary): What happened to each deck.
+    Returns:
+        str: The summary message.
+    """
+    if summary.cancelled_decks:
+        lines = ["Synchronization cancelled"]
+    else:
+        lines = ["Synchronization complete"]
+    if summary.synced_decks:
+        lines.append(
+            f"\nUpdated ({len(summary.synced_decks)}): "
+            + ", ".join(summary.synced_decks)
+        )
+    if summary.skipped_decks:
+        lines.append(
+            f"\nUnchanged, skipped ({len(summary.skipped_decks)}): "
+            + ", ".join(summary.skipped_decks)
+        )
+    if summary.offline_decks:
+        lines.append(
+            f"\nFrom saved snapshot ({len(summary.offline_decks)}): "
+            + ", ".join(summary.offline_decks)
+        )
+    if summary.cancelled_decks:
+        lines.append(
+            f"\nNot synced ({len(summary.cancelled_decks)}): "
+            + ", ".join(summary.cancelled_decks)
+        )
+    note_counts = summary.note_counts
+    if summary.synced_decks:
+        lines.append(
+            f"\nNotes: {note_counts.added} added, {note_counts.updated} updated, "
+            f"{note_counts.unchanged} unchanged, {note_counts.removed} removed"
+        )
+        if note_counts.renamed:
+            lines.append(f"Keys edited in the sheet: {note_counts.renamed}")
+    if summary.failed_decks:
+        lines.append(f"\nFailed ({len(summary.failed_decks)}):")
+        for deck_name, error in summary.failed_decks:
+            lines.append(f"{deck_name}: {error}")
+    return "\n".join(lines)
 
 
 def get_or_create_deck(col: Collection, deck_name: str) -> int:
@@ -82,90 +546,292 @@ def create_or_update_notes(
     deck_id: int,
     note_type_name: str,
     notecard_key_field: str,
-) -> None:
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    remote_deck_diff: Optional[RemoteDeckDiff] = None,
+    batch_size: int = DEFAULT_WRITE_BATCH_SIZE,
+    undo_entry: Optional[SyncUndoEntry] = None,
+    note_index: Optional[NoteIndex] = None,
+    guid_url: Optional[str] = None,
+    rename_similarity: float = DEFAULT_RENAME_SIMILARITY,
+    append_only: bool = False,
+) -> NoteChangeCounts:
     """Create or update notes in the Anki collection based on the remote deck.
+
+    Runs iter_create_or_update_notes in one go, see there for the arguments.
+
+    Returns:
+        NoteChangeCounts: How many notes were added, updated, left unchanged and removed.
+    """
+    return run_to_completion(
+        iter_create_or_update_notes(
+            col,
+            remote_deck,
+            deck_id,
+            note_type_name,
+            notecard_key_field,
+            progress_callback,
+            remote_deck_diff,
+            batch_size,
+            undo_entry,
+            note_index,
+            guid_url,
+            rename_similarity,
+            append_only,
+        )
+    )
+
+
+def iter_create_or_update_notes(
+    col: Collection,
+    remote_deck: RemoteDeck,
+    deck_id: int,
+    note_type_name: str,
+    notecard_key_field: str,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    remote_deck_diff: Optional[RemoteDeckDiff] = None,
+    batch_size: int = DEFAULT_WRITE_BATCH_SIZE,
+    undo_entry: Optional[SyncUndoEntry] = None,
+    note_index: Optional[NoteIndex] = None,
+    guid_url: Optional[str] = None,
+    rename_similarity: float = DEFAULT_RENAME_SIMILARITY,
+    append_only: bool = False,
+) -> Generator[None, None, NoteChangeCounts]:
+    """Create or update notes from the remote deck, in chunks.
+
+    Existing notes are only written when their fields or tags differ from the
+    row, so unchanged notes keep their modification time and are not uploaded
+    again by the next AnkiWeb sync.
+
+    Rows are applied in chunks of batch_size: the new and modified notes of a
+    chunk are sent to the collection in bulk and recorded in the note index,
+    then released, and the generator yields so the caller can let Qt run. Only
+    one chunk of notes is ever held in memory, and since the index is written
+    with every chunk, a sync that is interrupted picks up where it stopped:
+    the rows already applied are found unchanged without loading their notes.
+
     Args:
         col (Collection): The Anki collection.
         remote_deck (RemoteDeck): The remote deck containing notecards.
         deck_id (int): The ID of the deck where notes will be added or updated.
         note_type_name (str): The name of the note type to use.
         notecard_key_field (str): The field used as a unique key for notecards
+        progress_callback (Callable[[int, int], None], optional): Called with (rows done, total rows)
+            before each row. It may raise to stop the update before any note is removed. Defaults to None.
+        remote_deck_diff (RemoteDeckDiff, optional): Changes since the last sync. When given, only
+            added and changed rows are written, plus unchanged rows whose note is missing. Defaults to None.
+        batch_size (int, optional): Number of rows per chunk. Defaults to DEFAULT_WRITE_BATCH_SIZE.
+        undo_entry (SyncUndoEntry, optional): Undo step every write is merged into. Defaults to None.
+        note_index (NoteIndex, optional): The sidecar index of the deck. When given, notes are
+            found through it rather than by their deck, and it is kept up to date. Defaults to None.
+        guid_url (str, optional): When given, new notes get a GUID derived from this URL and
+            their key, and rows without a known note are matched to one by GUID. Defaults to None.
+        rename_similarity (float, optional): Minimum similarity between the other fields of
+            a removed note and a new row for the row to update the note, taken as having its
+            key edited. Defaults to DEFAULT_RENAME_SIMILARITY.
+        append_only (bool, optional): The rows were appended to the sheet and every other row
+            is unchanged, so only their keys are looked up and no note is removed. Defaults to False.
+    Returns:
+        NoteChangeCounts: How many notes were added, updated, left unchanged and removed.
     """
-
-    # Dictionaries for existing notes
-    existing_notes = {}
-    existing_note_ids = {}
-
-    notes = col.find_notes(f'deck:"{remote_deck.deck_name}"')
-
-    # Fetch existing notes in the deck
-    for nid in notes:
-        note = col.get_note(nid)
-        key = ""
-
-        # Use the specified key field to identify notes
-        if notecard_key_field in note:
-            key = note[notecard_key_field]
-        else:
-            continue  # Skip notes without the specified key field
-        existing_notes[key] = note
-        existing_note_ids[key] = nid
+    note_counts = NoteChangeCounts()
+    batch_size = max(1, int(batch_size))
+    # Notes waiting to be written in bulk
+    notes_to_add: list[AddNoteRequest] = []
+    notes_to_update: list[Note] = []
+    # (key, note) of the notes to record in the index once written
+    notes_to_index: list[tuple[str, Note]] = []
+
+    def write_pending_notes() -> None:
+        nonlocal notes_to_add, notes_to_update, notes_to_index
+        if undo_entry is not None and (notes_to_add or notes_to_update):
+            undo_entry.begin()
+        if notes_to_add:
+            col.add_notes(notes_to_add)
+            notes_to_add = []
+        if notes_to_update:
+            col.update_notes(notes_to_update)
+            notes_to_update = []
+        if undo_entry is not None:
+            # Merge as we go, since Anki only keeps the last few undo steps
+            undo_entry.merge()
+        if note_index is not None:
+            note_index.record_notes(notes_to_index)
+        notes_to_index = []
+
+    # Position of the key in the values of each notecard
+    key_column = remote_deck.field_names.index(notecard_key_field)
+
+    # Map each key to its note, without loading the notes
+    walked_deck = False
+    if append_only and note_index is not None:
+        key_index = note_index.load(
+            notecard.values[key_column] for notecard in remote_deck.notecards
+        )
+    else:
+        key_index = note_index.load() if note_index is not None else {}
+        walked_deck = not key_index
+    if walked_deck:
+        key_index = build_key_index(col, deck_id, notecard_key_field)
+        if note_index is not None:
+            # Adopt the notes already in the deck, as on the first sync
+            note_index.add_entries(key_index)
+
+    # Resolve the note type and the position of each column once for all rows
+    template = prepare_note_template(
+        col, note_type_name, deck_id, remote_deck.field_names
+    )
 
     # Set to keep track of keys from Google Sheets
     gs_keys = set()
 
-    for notecard in remote_deck.notecards:
-        card_type = notecard["type"]
-        fields = notecard["fields"]
-        tags = notecard.get("tags", [])
+    if remote_deck_diff is None:
+        notecards = remote_deck.notecards
+    else:
+        if not append_only:
+            gs_keys.update(remote_deck_diff.row_hashes)
+        # Unchanged rows only need writing if their note has gone missing, or was
+        # changed outside of the add-on (edited, or restored by an undo)
+        notecards = remote_deck_diff.added + remote_deck_diff.changed
+        stale_notecards = [
+            notecard
+            for notecard in remote_deck_diff.unchanged
+            if key_index.get(notecard.values[key_column], (0, None))[1] is None
+        ]
+        notecards += stale_notecards
+        note_counts.unchanged += len(remote_deck_diff.unchanged) - len(stale_notecards)
+
+    # Look for notes the index does not know about before creating new ones
+    new_keys = [
+        notecard.values[key_column]
+        for notecard in notecards
+        if notecard.values[key_column] not in key_index
+    ]
+    found_notes = {}
+    if new_keys and guid_url is not None:
+        # Notes made from a row keep their GUID wherever they are moved
+        found_notes = find_notes_by_guid(col, guid_url, new_keys)
+        new_keys = [key for key in new_keys if key not in found_notes]
+    key_ord = template.field_ords[key_column]
+    if new_keys and not walked_deck:
+        if key_ord == 0:
+            # Use the indexed checksum Anki keeps of the first field
+            found_notes.update(
+                find_notes_by_key_checksum(col, deck_id, template.model["id"], new_keys)
+            )
+        else:
+            # Nothing indexes other fields, so read the deck for these keys only
+            found_notes.update(
+                build_key_index(col, deck_id, notecard_key_field, new_keys)
+            )
+    if found_notes:
+        key_index.update(found_notes)
+        if note_index is not None:
+            note_index.add_entries(found_notes)
+
+    # Keys edited in the sheet update their note instead of replacing it
+    if append_only:
+        # Appending rows removes none, so there is nothing to pair up
+        sheet_keys = set(key_index)
+    elif remote_deck_diff is not None:
+        sheet_keys = set(remote_deck_diff.row_hashes)
+    else:
+        sheet_keys = {notecard.values[key_column] for notecard in notecards}
+    removed_notes = {
+        key: key_index[key][0] for key in key_index if key not in sheet_keys
+    }
+    added_notecards = {
+        notecard.values[key_column]: notecard.values
+        for notecard in notecards
+        if notecard.values[key_column] not in key_index
+    }
+    renames = find_renamed_keys(
+        col,
+        template,
+        notecard_key_field,
+        removed_notes,
+        added_notecards,
+        rename_similarity,
+    )
+    for old_key, new_key in renames:
+        note_id, _, mod = key_index.pop(old_key)
+        # The hash is unknown so the note is loaded and compared
+        key_index[new_key] = (note_id, None, mod)
+    if renames and note_index is not None:
+        note_index.rename_keys(renames)
+    note_counts.renamed = len(renames)
+
+    total_rows = len(notecards)
+    for row_index, notecard in enumerate(notecards):
+        if row_index and row_index % batch_size == 0:
+            # End of a chunk: commit it and let the caller yield to Qt
+            write_pending_notes()
+            yield
+            if undo_entry is not None:
+                undo_entry.resume()
+
+        if progress_callback is not None:
+            progress_callback(row_index, total_rows)
+
+        values = notecard.values
+        tags = notecard.tags
+        key = values[key_column]
 
         try:
-            key = fields[notecard_key_field]
             gs_keys.add(key)
 
-            if key in existing_notes:
-                # Update existing note
-                note = existing_notes[key]
-                for field_name, value in fields.items():
-                    note[field_name] = value
-                note.tags = tags
-                note.flush()
-            else:
-                # Create new note
-                model = col.models.by_name(note_type_name)
-                if model is None:
-                    showInfo(
-                        f"The {note_type_name} model does not exist. Please create a {note_type_name} model in Anki."
-                    )
+            if key in key_index:
+                note_id, note_hash, _ = key_index[key]
+                note_fields = get_note_fields(template, values)
+                if note_fields is not None and is_note_unchanged(
+                    note_hash, note_fields, tags
+                ):
+                    note_counts.unchanged += 1
                     continue
 
-                col.models.set_current(model)
-                model["did"] = deck_id
-                col.models.save(model)
-
-                note = col.new_note(model)
-                for field_name, value in fields.items():
-                    note[field_name] = value
-                note.tags = tags
-                col.add_note(note, deck_id)
+                # Update existing note, loading only the notes that may change
+                note = col.get_note(note_id)
+                if fill_note(note, template, values, tags):
+                    notes_to_update.append(note)
+                    note_counts.updated += 1
+                else:
+                    note_counts.unchanged += 1
+                notes_to_index.append((key, note))
+            else:
+                # Create new note
+                note = new_note(col, template, values, tags)
+                if guid_url is not None:
+                    note.guid = compute_note_guid(guid_url, key)
+                notes_to_add.append(AddNoteRequest(note=note, deck_id=template.deck_id))
+                notes_to_index.append((key, note))
+                note_counts.added += 1
 
         except Exception as e:
             showInfo(
-                f"Unknown card type '{card_type}' for card '{key}', with error: {e}.\nSkipping."
+                f"Unknown card type '{note_type_name}' for card '{key}', with error: {e}.\nSkipping."
             )
             continue
 
+    write_pending_notes()
+
     # Find notes that are in Anki but not in Google Sheets
-    anki_keys = set(existing_notes.keys())
-    notes_to_delete = anki_keys - gs_keys
+    if append_only:
+        note_ids_to_delete = []
+    elif note_index is not None:
+        note_ids_to_delete = note_index.pop_orphans(gs_keys)
+    else:
+        notes_to_delete = set(key_index.keys()) - gs_keys
+        note_ids_to_delete = [key_index[key][0] for key in notes_to_delete]
 
     # Remove the corresponding notes
-    if notes_to_delete:
-        note_ids_to_delete = [existing_note_ids[key] for key in notes_to_delete]
+    if note_ids_to_delete:
+        if undo_entry is not None:
+            undo_entry.begin()
         col.remove_notes(note_ids_to_delete)
+        note_counts.removed = len(note_ids_to_delete)
+        if undo_entry is not None:
+            undo_entry.merge()
 
-    # Save changes
-    col.save()
+    return note_counts
 
 
 def add_new_deck() -> None:
@@ -237,23 +903,32 @@ def add_new_deck() -> None:
         showInfo(f"The deck has already been added before: {url}")
         return
 
-    try:
-        deck = get_remote_deck(url, note_type_name, note_type_fields)
-        deck.deck_name = deck_name
-    except Exception as e:
-        showInfo(f"Error fetching the remote deck:\n{e}")
-        return
-
     config["remote-decks"][url] = {
         "url": url,
         "deck_name": deck_name,
         "note_type": note_type_name,
         "note_type_fields": note_type_fields,
         "notecard_key_field": notecard_key_field,
+        "tags_column": DEFAULT_TAGS_COLUMN,
+        "tag_separator": DEFAULT_TAG_SEPARATOR,
     }
 
     mw.addonManager.writeConfig(__name__, config)
-    sync_decks()
+
+    def on_first_sync_done(summary: Optional[SyncSummary]) -> None:
+        if summary is not None and url not in summary.failed_urls:
+            return
+        # The sheet could not be downloaded or does not fit the note type
+        current_config = mw.addonManager.getConfig(__name__) or {}
+        current_config.get("remote-decks", {}).pop(url, None)
+        mw.addonManager.writeConfig(__name__, current_config)
+        delete_snapshot(url)
+        if mw.col is not None:
+            forget_deck(mw.col, url)
+        tooltip(f"The deck '{deck_name}' was not added.")
+
+    # The sheet is checked by its first sync, downloaded in the background
+    sync_decks(deck_urls=[url], on_done=on_first_sync_done)
 
 
 def remove_remote_deck() -> None:
@@ -282,6 +957,8 @@ def remove_remote_deck() -> None:
     if ok_pressed:
         for key in list(remote_decks.keys()):
             if selection == remote_decks[key]["deck_name"]:
+                delete_snapshot(remote_decks[key]["url"])
+                forget_deck(mw.col, remote_decks[key]["url"])
                 del remote_decks[key]
                 break
 
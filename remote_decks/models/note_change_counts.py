@@ -0,0 +1,19 @@
+class NoteChangeCounts:
+    def __init__(self):
+        # Notes created for rows with a new key
+        self.added = 0
+        # Notes whose fields or tags were rewritten
+        self.updated = 0
+        # Notes left untouched because their row did not change
+        self.unchanged = 0
+        # Notes deleted because their row is gone from the sheet
+        self.removed = 0
+        # Updated notes whose key was edited in the sheet
+        self.renamed = 0
+
+    def add(self, other: "NoteChangeCounts") -> None:
+        self.added += other.added
+        self.updated += other.updated
+        self.unchanged += other.unchanged
+        self.removed += other.removed
+        self.renamed += other.renamed
@@ -0,0 +1,19 @@
+from typing import Optional
+
+from anki.models import NotetypeDict
+
+
+class NoteTemplate:
+    def __init__(self):
+        # The note type of the deck, resolved once
+        self.model: Optional[NotetypeDict] = None
+        # The deck new notes are added to
+        self.deck_id: int = 0
+        # Names of the sheet columns, in CSV column order
+        self.field_names: list[str] = []
+        # Ordinal in the note type of each column, in CSV column order
+        self.field_ords: list[int] = []
+        # Number of fields of the note type
+        self.field_count: int = 0
+        # Whether the columns fill every field of the note type
+        self.covers_all_fields: bool = False
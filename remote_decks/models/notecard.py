@@ -0,0 +1,18 @@
+from typing import Optional
+
+
+class Notecard:
+    """One row of a sheet.
+
+    The names of the fields are not repeated on every row: values are kept in
+    a tuple, in the column order of RemoteDeck.field_names, which all the rows
+    of a deck share.
+    """
+
+    __slots__ = ("values", "tags")
+
+    def __init__(self, values: tuple[str, ...], tags: Optional[tuple[str, ...]] = None):
+        # Values of the fields, in CSV column order
+        self.values = values
+        # Tags of the note, or None if the sheet has no tags column
+        self.tags = tags
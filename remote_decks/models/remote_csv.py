@@ -0,0 +1,18 @@
+from typing import BinaryIO, Optional
+
+
+class RemoteCsv:
+    def __init__(self):
+        # Temporary file holding the raw bytes of the download
+        self.body: Optional[BinaryIO] = None
+        self.content_hash: str = ""
+        # Number of bytes downloaded
+        self.content_length: int = 0
+        # Hash of the first bytes of the download, when asked for, see download_remote_csv
+        self.prefix_hash: Optional[str] = None
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+
+    def close(self):
+        if self.body is not None:
+            self.body.close()
@@ -1,8 +1,18 @@
+from typing import Optional
+
+from .notecard import Notecard
+
+
 class RemoteDeck:
     def __init__(self):
         self.deck_name: str = ""
-        self.notecards = []
+        self.notecards: list[Notecard] = []
+        # Names of the columns of the sheet, in CSV column order, shared by all the notecards
+        self.field_names: list[str] = []
         self.media = []
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.encoding: Optional[str] = None
 
     def get_media(self):
         return self.media
@@ -1,3 +1,6 @@
+from typing import Optional
+
+
 class RemoteDeckConfig:
     def __init__(self):
         self.url: str = ""
@@ -5,3 +8,18 @@ class RemoteDeckConfig:
         self.note_type: str = ""
         self.note_type_fields: list[str] = []
         self.notecard_key_field: str = ""
+        # Header of the column holding the tags of each row, if the sheet has one
+        self.tags_column: Optional[str] = None
+        # What separates two tags in that column
+        self.tag_separator: str = " "
+        # Name of the tab of the spreadsheet, when the deck is read from the whole
+        # spreadsheet downloaded once for all its decks
+        self.sheet_name: Optional[str] = None
+        # Which column each field is read from, see column_mapping
+        self.column_mapping: Optional[dict] = None
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.content_hash: Optional[str] = None
+        self.content_length: Optional[int] = None
+        self.config_hash: Optional[str] = None
+        self.encoding: Optional[str] = None
@@ -0,0 +1,13 @@
+from .notecard import Notecard
+
+
+class RemoteDeckDiff:
+    def __init__(self):
+        # Notecards whose key was not in the previous version of the sheet
+        self.added: list[Notecard] = []
+        # Notecards whose row differs from the previous version of the sheet
+        self.changed: list[Notecard] = []
+        # Notecards identical to the previous version of the sheet
+        self.unchanged: list[Notecard] = []
+        # Hash of every row of the new version of the sheet, by key
+        self.row_hashes: dict[str, str] = {}
@@ -0,0 +1,24 @@
+from typing import Optional
+
+from .remote_deck import RemoteDeck
+from .remote_deck_config import RemoteDeckConfig
+from .remote_deck_diff import RemoteDeckDiff
+
+
+class RemoteDeckFetch:
+    def __init__(self, remote_deck_config: RemoteDeckConfig):
+        self.remote_deck_config = remote_deck_config
+        # Left as None when the sheet is unchanged since the last sync
+        self.remote_deck: Optional[RemoteDeck] = None
+        self.remote_deck_diff: Optional[RemoteDeckDiff] = None
+        self.content_hash: Optional[str] = None
+        self.content_length: Optional[int] = None
+        # ETag and Last-Modified of the response, whenever the sheet was downloaded,
+        # changed or not
+        self.validators: Optional[tuple[Optional[str], Optional[str]]] = None
+        self.error: Optional[Exception] = None
+        # Set when the deck was rebuilt from its snapshot instead of a download
+        self.from_snapshot: bool = False
+        # Set when the sheet only gained rows at the bottom, which are the only
+        # ones parsed into remote_deck
+        self.append_only: bool = False
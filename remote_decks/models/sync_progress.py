@@ -0,0 +1,66 @@
+import threading
+
+
+class SyncCancelled(Exception):
+    """Raised inside a sync once the user has asked to cancel it."""
+
+
+class SyncProgress:
+    """Thread-safe progress of a sync, written by workers and read by the UI."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self.phase: str = ""
+        self.deck_name: str = ""
+        self.decks_done: int = 0
+        self.decks_total: int = 0
+        self.rows_done: int = 0
+        self.rows_total: int = 0
+
+    def start_phase(self, phase: str, decks_total: int) -> None:
+        with self._lock:
+            self.phase = phase
+            self.deck_name = ""
+            self.decks_done = 0
+            self.decks_total = decks_total
+            self.rows_done = 0
+            self.rows_total = 0
+
+    def start_deck(self, deck_name: str) -> None:
+        with self._lock:
+            self.deck_name = deck_name
+
+    def finish_deck(self) -> None:
+        with self._lock:
+            self.decks_done += 1
+
+    def set_rows(self, rows_done: int, rows_total: int) -> None:
+        with self._lock:
+            self.rows_done = rows_done
+            self.rows_total = rows_total
+
+    def advance_rows(self, count: int = 1) -> None:
+        with self._lock:
+            self.rows_done += count
+
+    def get_state(self) -> tuple[str, str, int, int, int, int]:
+        with self._lock:
+            return (
+                self.phase,
+                self.deck_name,
+                self.decks_done,
+                self.decks_total,
+                self.rows_done,
+                self.rows_total,
+            )
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        if self._cancelled.is_set():
+            raise SyncCancelled("Synchronization cancelled")
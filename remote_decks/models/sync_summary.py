@@ -0,0 +1,19 @@
+from .note_change_counts import NoteChangeCounts
+
+
+class SyncSummary:
+    def __init__(self):
+        # Names of the decks whose notes were updated
+        self.synced_decks: list[str] = []
+        # Names of the decks skipped because their sheet is unchanged
+        self.skipped_decks: list[str] = []
+        # (deck name, error message) of the decks that failed to sync
+        self.failed_decks: list[tuple[str, str]] = []
+        # URLs of the decks that failed to sync
+        self.failed_urls: list[str] = []
+        # Names of the decks left untouched because the sync was cancelled
+        self.cancelled_decks: list[str] = []
+        # Names of the decks rebuilt from their offline snapshot
+        self.offline_decks: list[str] = []
+        # Notes added, updated, unchanged and removed across the synced decks
+        self.note_counts = NoteChangeCounts()
@@ -0,0 +1,277 @@
+"""Sidecar index of the notes created from each remote deck.
+
+One row per (remote deck URL, key) records the id of the note made from that
+row, the hash of its fields and tags as last written (see compute_note_hash),
+the note's modification time at that point, and the generation of the last
+sync that saw the key in the sheet. Looking notes up and finding the ones
+whose row is gone are then indexed queries, which keep working when the user
+renames or moves the deck.
+
+The index lives in the add-on's user_files folder, one database per
+collection. Deletions made in Anki are mirrored through the
+notes_will_be_deleted hook, and anything it can still miss, such as notes
+deleted or edited by an AnkiWeb sync, is caught by checking the recorded note
+ids and modification times against the collection when the index is loaded.
+"""
+
+import hashlib
+import os
+import sqlite3
+from typing import Iterable, Optional, Sequence
+
+from anki.collection import Collection
+from anki.notes import Note
+from anki.utils import ids2str
+
+from .key_index import LOOKUP_QUERY_SIZE, compute_note_hash
+from .log import get_logger
+from .snapshots import ADDON_PATH
+
+logger = get_logger(__name__)
+
+INDEX_PATH = os.path.join(ADDON_PATH, "user_files", "index")
+
+SCHEMA = """
+create table if not exists decks (
+    url text primary key,
+    config_hash text not null,
+    generation integer not null
+);
+create table if not exists notes (
+    url text not null,
+    key text not null,
+    nid integer not null,
+    hash text,
+    mod integer not null,
+    generation integer not null,
+    primary key (url, key)
+) without rowid;
+create index if not exists notes_nid on notes (nid);
+create index if not exists notes_generation on notes (url, generation);
+"""
+
+
+def get_index_path(col: Collection) -> str:
+    """Returns the index database of a collection.
+
+    Args:
+        col (Collection): The Anki collection.
+    Returns:
+        str: The path of its index database.
+    """
+    name = hashlib.sha1(col.path.encode("utf-8")).hexdigest()
+    return os.path.join(INDEX_PATH, f"{name}.sqlite")
+
+
+def connect(col: Collection) -> sqlite3.Connection:
+    os.makedirs(INDEX_PATH, exist_ok=True)
+    db = sqlite3.connect(get_index_path(col))
+    db.executescript(SCHEMA)
+    return db
+
+
+class NoteIndex:
+    """The indexed notes of one remote deck, for the duration of a sync.
+
+    Opening the index starts a new sync generation for the deck. Entries
+    recorded for another note configuration are dropped, since their keys may
+    come from another field.
+    """
+
+    def __init__(self, col: Collection, url: str, config_hash: str):
+        self.col = col
+        self.url = url
+        self.db = connect(col)
+
+        row = self.db.execute(
+            "select config_hash, generation from decks where url = ?", (url,)
+        ).fetchone()
+        if row is not None and row[0] != config_hash:
+            self.db.execute("delete from notes where url = ?", (url,))
+        self.generation = row[1] + 1 if row is not None else 1
+        self.db.execute(
+            "insert or replace into decks values (?, ?, ?)",
+            (url, config_hash, self.generation),
+        )
+        self.db.commit()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def load(
+        self, keys: Optional[Iterable[str]] = None
+    ) -> dict[str, tuple[int, Optional[str], int]]:
+        """Maps the indexed keys of the deck to their note.
+
+        Entries whose note is gone from the collection are dropped. The hash of
+        a note modified since it was recorded is unknown and given as None.
+
+        Args:
+            keys (Iterable[str], optional): Only look these keys up. Defaults to every key.
+        Returns:
+            dict[str, tuple[int, Optional[str], int]]: (note id, note hash, modification
+                time) by key.
+        """
+        if keys is None:
+            entries = self.db.execute(
+                "select key, nid, hash, mod from notes where url = ?", (self.url,)
+            ).fetchall()
+        else:
+            keys = list(keys)
+            entries = []
+            for start in range(0, len(keys), LOOKUP_QUERY_SIZE):
+                chunk = keys[start : start + LOOKUP_QUERY_SIZE]
+                entries += self.db.execute(
+                    "select key, nid, hash, mod from notes where url = ? "
+                    f"and key in ({', '.join('?' * len(chunk))})",
+                    (self.url, *chunk),
+                ).fetchall()
+        if not entries:
+            return {}
+
+        mods = dict(
+            self.col.db.all(
+                "select id, mod from notes where id in "
+                + ids2str(nid for _, nid, _, _ in entries)
+            )
+        )
+        key_index = {}
+        missing_keys = []
+        for key, nid, note_hash, mod in entries:
+            if nid not in mods:
+                missing_keys.append((self.url, key))
+                continue
+            if mods[nid] != mod:
+                # Edited outside of the add-on since the last sync
+                note_hash = None
+            key_index[key] = (nid, note_hash, mods[nid])
+        if missing_keys:
+            self.db.executemany(
+                "delete from notes where url = ? and key = ?", missing_keys
+            )
+            self.db.commit()
+        return key_index
+
+    def add_entries(self, key_index: dict[str, tuple[int, Optional[str], int]]) -> None:
+        """Records notes found in the collection, as returned by build_key_index.
+
+        They are recorded as seen by the previous generation, so that pop_orphans
+        forgets those whose key is not in the sheet.
+
+        Args:
+            key_index (dict[str, tuple[int, Optional[str], int]]): (note id, note hash,
+                modification time) by key.
+        """
+        self.db.executemany(
+            "insert or replace into notes values (?, ?, ?, ?, ?, ?)",
+            (
+                (self.url, key, nid, note_hash, mod, self.generation - 1)
+                for key, (nid, note_hash, mod) in key_index.items()
+            ),
+        )
+        self.db.commit()
+
+    def record_notes(self, notes: Sequence[tuple[str, Note]]) -> None:
+        """Records notes just written to the collection, or checked against it.
+
+        Args:
+            notes (Sequence[tuple[str, Note]]): (key, note) of the notes, which must have an id.
+        """
+        if not notes:
+            return
+        # Note objects do not learn the modification time given by the backend
+        mods = dict(
+            self.col.db.all(
+                "select id, mod from notes where id in "
+                + ids2str(note.id for _, note in notes)
+            )
+        )
+        self.db.executemany(
+            "insert or replace into notes values (?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    self.url,
+                    key,
+                    note.id,
+                    compute_note_hash(note.fields, note.tags),
+                    mods.get(note.id, 0),
+                    self.generation,
+                )
+                for key, note in notes
+            ),
+        )
+        self.db.commit()
+
+    def rename_keys(self, renames: Iterable[tuple[str, str]]) -> None:
+        """Moves the entries of notes whose key was edited in the sheet.
+
+        Args:
+            renames (Iterable[tuple[str, str]]): (old key, new key) pairs.
+        """
+        self.db.executemany(
+            "update notes set key = ? where url = ? and key = ?",
+            ((new_key, self.url, old_key) for old_key, new_key in renames),
+        )
+        self.db.commit()
+
+    def pop_orphans(self, keys: Iterable[str]) -> list[int]:
+        """Marks the keys of the sheet as seen and forgets the notes of the others.
+
+        Args:
+            keys (Iterable[str]): Every key of the current version of the sheet.
+        Returns:
+            list[int]: The ids of the notes whose row is gone from the sheet.
+        """
+        self.db.executemany(
+            "update notes set generation = ? where url = ? and key = ?",
+            ((self.generation, self.url, key) for key in keys),
+        )
+        orphans = self.db.execute(
+            "select nid from notes where url = ? and generation < ?",
+            (self.url, self.generation),
+        ).fetchall()
+        self.db.execute(
+            "delete from notes where url = ? and generation < ?",
+            (self.url, self.generation),
+        )
+        self.db.commit()
+        return [nid for (nid,) in orphans]
+
+
+def forget_notes(col: Collection, note_ids: Sequence[int]) -> None:
+    """Drops deleted notes from the index. Meant for the notes_will_be_deleted hook.
+
+    Args:
+        col (Collection): The Anki collection.
+        note_ids (Sequence[int]): The ids of the notes being deleted.
+    """
+    if not note_ids or not os.path.isfile(get_index_path(col)):
+        return
+    try:
+        db = connect(col)
+        try:
+            db.execute(f"delete from notes where nid in {ids2str(note_ids)}")
+            db.commit()
+        finally:
+            db.close()
+    except sqlite3.Error as e:
+        # Never get in the way of the deletion, the next sync drops the entries anyway
+        logger.warning("Could not update the note index: %s", e)
+
+
+def forget_deck(col: Collection, url: str) -> None:
+    """Drops a remote deck from the index, once it is unlinked.
+
+    Args:
+        col (Collection): The Anki collection.
+        url (str): The URL of the remote deck.
+    """
+    if not os.path.isfile(get_index_path(col)):
+        return
+    db = connect(col)
+    try:
+        db.execute("delete from notes where url = ?", (url,))
+        db.execute("delete from decks where url = ?", (url,))
+        db.commit()
+    finally:
+        db.close()
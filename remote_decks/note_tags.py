@@ -0,0 +1,63 @@
+"""Tags read from the tags column of a sheet.
+
+A cell holds any number of tags separated by the tag separator of the deck.
+"::" separates the levels of a hierarchical tag, like in Anki, so a cell
+such as "Geography::Europe Capitals" gives two tags, the first one nested.
+Anki tags cannot contain spaces, so with any separator other than a space
+the spaces inside a tag are replaced with underscores.
+"""
+
+import sys
+import unicodedata
+from typing import Iterable
+
+DEFAULT_TAGS_COLUMN = "Tags"
+DEFAULT_TAG_SEPARATOR = " "
+
+
+def normalize_tag(tag: str) -> str:
+    """Cleans one tag up the way Anki would store it.
+
+    Args:
+        tag (str): A tag as typed in the sheet.
+    Returns:
+        str: The tag in NFC form, with empty levels dropped and spaces replaced, or
+            an empty string if nothing is left.
+    """
+    levels = (level.strip() for level in tag.split("::"))
+    tag = "::".join("_".join(level.split()) for level in levels if level)
+    return unicodedata.normalize("NFC", tag)
+
+
+def split_tags(text: str, separator: str = DEFAULT_TAG_SEPARATOR) -> tuple[str, ...]:
+    """Splits the tags column of a row into tags.
+
+    Tag strings are interned, since the rows of a sheet usually share a few
+    tags between them.
+
+    Args:
+        text (str): The content of the cell.
+        separator (str, optional): What separates two tags. Any whitespace when blank.
+            Defaults to DEFAULT_TAG_SEPARATOR.
+    Returns:
+        tuple[str, ...]: The tags in the order of the cell, without duplicates.
+    """
+    pieces = text.split(separator) if separator.strip() else text.split()
+    tags: dict[str, str] = {}
+    for piece in pieces:
+        tag = normalize_tag(piece)
+        # Anki ignores case in tags
+        if tag and tag.casefold() not in tags:
+            tags[tag.casefold()] = sys.intern(tag)
+    return tuple(tags.values())
+
+
+def get_tag_set(tags: Iterable[str]) -> frozenset[str]:
+    """Returns what Anki sees of some tags: a set, ignoring case.
+
+    Args:
+        tags (Iterable[str]): The tags of a note or a row.
+    Returns:
+        frozenset[str]: The casefolded tags.
+    """
+    return frozenset(tag.casefold() for tag in tags)
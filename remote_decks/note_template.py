@@ -0,0 +1,136 @@
+"""Note templates: the note type of a deck resolved once for all its rows.
+
+Looking a field up by name on a Note scans the note type every time, so rows
+are instead written by ordinal, using the positions worked out here once per
+deck.
+"""
+
+import unicodedata
+from typing import Optional, Sequence
+
+from anki.collection import Collection
+from anki.notes import Note
+
+from .models.note_template import NoteTemplate
+from .note_tags import get_tag_set
+
+
+def prepare_note_template(
+    col: Collection, note_type_name: str, deck_id: int, field_names: list[str]
+) -> NoteTemplate:
+    """Resolves the note type of a deck and the position of each column in it.
+
+    Args:
+        col (Collection): The Anki collection.
+        note_type_name (str): The name of the note type to use.
+        deck_id (int): The ID of the deck where new notes are added.
+        field_names (list[str]): The columns of the sheet, in CSV column order.
+    Returns:
+        NoteTemplate: The prepared template.
+    """
+    model = col.models.by_name(note_type_name)
+    if model is None:
+        raise Exception(
+            f"The {note_type_name} model does not exist. Please create a {note_type_name} model in Anki."
+        )
+
+    field_map = col.models.field_map(model)
+    missing_fields = [name for name in field_names if name not in field_map]
+    if missing_fields:
+        raise Exception(
+            f"The {note_type_name} model has no field named: {', '.join(missing_fields)}"
+        )
+
+    template = NoteTemplate()
+    template.model = model
+    template.deck_id = deck_id
+    template.field_names = list(field_names)
+    template.field_ords = [field_map[name][0] for name in field_names]
+    template.field_count = len(field_map)
+    template.covers_all_fields = set(template.field_ords) == set(
+        range(template.field_count)
+    )
+    return template
+
+
+def get_note_fields(
+    template: NoteTemplate, values: Sequence[str]
+) -> Optional[list[str]]:
+    """Lays the values of a notecard out in the field order of the note type.
+
+    Args:
+        template (NoteTemplate): The prepared template of the deck.
+        values (Sequence[str]): The values of the notecard, in CSV column order.
+    Returns:
+        Optional[list[str]]: The values of every field of the note type, or None if
+            some fields of the note type are not in the sheet.
+    """
+    if not template.covers_all_fields:
+        return None
+    note_fields = [""] * template.field_count
+    for field_ord, value in zip(template.field_ords, values):
+        note_fields[field_ord] = value
+    return note_fields
+
+
+def new_note(
+    col: Collection,
+    template: NoteTemplate,
+    values: Sequence[str],
+    tags: Optional[Sequence[str]],
+) -> Note:
+    """Creates a note from a notecard, without adding it to the collection.
+
+    Args:
+        col (Collection): The Anki collection.
+        template (NoteTemplate): The prepared template of the deck.
+        values (Sequence[str]): The values of the notecard, in CSV column order.
+        tags (Sequence[str], optional): The tags of the notecard, None for no tags.
+    Returns:
+        Note: The new note.
+    """
+    note = col.new_note(template.model)
+    for field_ord, value in zip(template.field_ords, values):
+        note.fields[field_ord] = value
+    if tags:
+        note.tags = list(tags)
+    return note
+
+
+def fill_note(
+    note: Note,
+    template: NoteTemplate,
+    values: Sequence[str],
+    tags: Optional[Sequence[str]],
+) -> bool:
+    """Copies the fields and tags of a notecard into a note, if they differ.
+
+    Args:
+        note (Note): The note to update.
+        template (NoteTemplate): The prepared template of the deck.
+        values (Sequence[str]): The values of the notecard, in CSV column order.
+        tags (Sequence[str], optional): The tags of the notecard, None to leave the tags
+            of the note alone.
+    Returns:
+        bool: True if the note was modified and has to be written.
+    """
+    if note.mid == template.model["id"]:
+        field_ords = template.field_ords
+    else:
+        # The note was made with another note type that has the key field
+        ords_by_name = {
+            field["name"]: field["ord"] for field in note.note_type()["flds"]
+        }
+        field_ords = [ords_by_name[name] for name in template.field_names]
+
+    changed = False
+    for field_ord, value in zip(field_ords, values):
+        value = unicodedata.normalize("NFC", value)
+        if note.fields[field_ord] != value:
+            note.fields[field_ord] = value
+            changed = True
+    # Anki compares tags as a set, ignoring case
+    if tags is not None and get_tag_set(note.tags) != get_tag_set(tags):
+        note.tags = list(tags)
+        changed = True
+    return changed
@@ -1,35 +1,314 @@
 import csv
-from typing import Union
+import hashlib
+import io
+import itertools
+import logging
+import tempfile
+from typing import BinaryIO, Iterable, Iterator, Optional, Union
 
 import requests
 
+from . import http_client
+from .column_mapping import compile_row_projector
+from .decoding import SNIFF_SIZE, detect_encoding, guess_encoding
+from .log import get_logger
+from .models.remote_csv import RemoteCsv
+from .models.notecard import Notecard
 from .models.remote_deck import RemoteDeck
+from .models.sync_progress import SyncProgress
+from .note_tags import DEFAULT_TAG_SEPARATOR, split_tags
+
+logger = get_logger(__name__)
+
+# Number of rows parsed between two progress reports
+PROGRESS_INTERVAL = 100
+
+# Size of the blocks read from the network
+CHUNK_SIZE = 64 * 1024
+
+
+class RemoteCsvUnavailableError(Exception):
+    """Raised when a sheet could not be reached at all, as opposed to a bad response."""
 
 
 def get_remote_deck(
-    url: str, note_type_name: str, note_type_fields: list[str] = []
-) -> RemoteDeck:
+    url: str,
+    note_type_name: str,
+    note_type_fields: list[str] = [],
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+    tags_column: Optional[str] = None,
+    tag_separator: str = DEFAULT_TAG_SEPARATOR,
+    column_mapping: Optional[dict] = None,
+) -> Optional[RemoteDeck]:
     """Fetches and parses a remote deck from a CSV URL.
 
+    When validators from a previous download are given, the request is made
+    conditional and nothing is downloaded or parsed if the sheet is unchanged.
+
     Args:
         url (str): The URL of the CSV file.
         note_type_name (str): The name of the note type.
         note_type_fields (list[str], optional): List of fields in the note type. Defaults to [].
+        etag (str, optional): ETag returned by the last download. Defaults to None.
+        last_modified (str, optional): Last-Modified returned by the last download. Defaults to None.
+        tags_column (str, optional): Header of the optional tags column. Defaults to None.
+        tag_separator (str, optional): What separates two tags in that column.
+            Defaults to DEFAULT_TAG_SEPARATOR.
+        column_mapping (dict, optional): Which column each field is read from. Defaults to None.
+    Returns:
+        Optional[RemoteDeck]: The parsed remote deck, or None if the server answered 304 Not Modified.
+    """
+    remote_csv = download_remote_csv(url, etag, last_modified)
+    if remote_csv is None:
+        return None
+    try:
+        return build_remote_deck_from_remote_csv(
+            remote_csv,
+            note_type_name,
+            note_type_fields,
+            tags_column=tags_column,
+            tag_separator=tag_separator,
+            column_mapping=column_mapping,
+        )
+    finally:
+        remote_csv.close()
+
+
+def download_remote_csv(
+    url: str,
+    etag: Optional[str] = None,
+    last_modified: Optional[str] = None,
+    prefix_length: Optional[int] = None,
+) -> Optional[RemoteCsv]:
+    """Downloads a published CSV, conditionally if validators are given.
+
+    The body is streamed into a temporary file and hashed on the way, so the
+    download never has to be held in memory and the caller can decide from the
+    hash whether it is worth parsing at all.
+
+    Args:
+        url (str): The URL of the CSV file.
+        etag (str, optional): ETag returned by the last download. Defaults to None.
+        last_modified (str, optional): Last-Modified returned by the last download. Defaults to None.
+        prefix_length (int, optional): Also hash the first prefix_length bytes, typically the
+            length of the last download, to tell whether the sheet only grew. Defaults to None.
     Returns:
-        RemoteDeck: The parsed remote deck.
+        Optional[RemoteCsv]: The download, or None if the server answered 304 Not Modified.
+            The caller must close it.
+    Raises:
+        RemoteCsvUnavailableError: If the server could not be reached or timed out.
     """
+    remote_csv = RemoteCsv()
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        csv_data = response.content.decode("utf-8")
+        response = http_client.get(
+            url, headers=build_conditional_headers(etag, last_modified), stream=True
+        )
+        with response:
+            if response.status_code == 304:
+                return None
+            response.raise_for_status()
+
+            remote_csv.etag = response.headers.get("ETag")
+            remote_csv.last_modified = response.headers.get("Last-Modified")
+            remote_csv.body = tempfile.TemporaryFile()
+            content_hash = hashlib.sha256()
+            prefix_hash = hashlib.sha256() if prefix_length else None
+            position = 0
+            for chunk in response.iter_content(CHUNK_SIZE):
+                content_hash.update(chunk)
+                if prefix_hash is not None and position < prefix_length:
+                    prefix_hash.update(chunk[: prefix_length - position])
+                position += len(chunk)
+                remote_csv.body.write(chunk)
+            remote_csv.content_hash = content_hash.hexdigest()
+            remote_csv.content_length = position
+            if prefix_hash is not None and position >= prefix_length:
+                remote_csv.prefix_hash = prefix_hash.hexdigest()
+            remote_csv.body.seek(0)
+    except (requests.ConnectionError, requests.Timeout) as e:
+        remote_csv.close()
+        raise RemoteCsvUnavailableError(f"Error downloading or reading the CSV: {e}")
     except Exception as e:
+        remote_csv.close()
         raise Exception(f"Error downloading or reading the CSV: {e}")
+    return remote_csv
+
+
+def build_remote_deck_from_remote_csv(
+    remote_csv: RemoteCsv,
+    note_type_name: str,
+    note_type_fields: list[str],
+    progress: Optional[SyncProgress] = None,
+    preferred_encoding: Optional[str] = None,
+    tags_column: Optional[str] = None,
+    tag_separator: str = DEFAULT_TAG_SEPARATOR,
+    column_mapping: Optional[dict] = None,
+) -> RemoteDeck:
+    """Decodes and parses a downloaded CSV into a RemoteDeck, row by row.
+
+    Args:
+        remote_csv (RemoteCsv): A successful download.
+        note_type_name (str): The name of the note type.
+        note_type_fields (list[str]): List of fields in the note type.
+        progress (SyncProgress, optional): Receives row progress and signals cancellation. Defaults to None.
+        preferred_encoding (str, optional): Encoding detected for the deck last time. Defaults to None.
+        tags_column (str, optional): Header of the optional tags column. Defaults to None.
+        tag_separator (str, optional): What separates two tags in that column.
+            Defaults to DEFAULT_TAG_SEPARATOR.
+        column_mapping (dict, optional): Which column each field is read from. Defaults to None.
+    Returns:
+        RemoteDeck: The parsed remote deck, carrying the response validators and detected encoding.
+    """
+    encoding, bom_length = detect_encoding(remote_csv.body, preferred_encoding)
+    try:
+        remote_csv.body.seek(bom_length)
+        remote_deck = build_remote_deck_from_csv(
+            iter_csv_rows(remote_csv.body, encoding),
+            note_type_name,
+            note_type_fields,
+            progress,
+            tags_column,
+            tag_separator,
+            column_mapping,
+        )
+    except UnicodeDecodeError:
+        # The start of the file decoded fine but a later part does not. A start
+        # that is strict UTF-8 is not going to be anything else, so only a few
+        # bad bytes are replaced; otherwise guess again and replace the rest
+        if encoding != "utf-8":
+            remote_csv.body.seek(bom_length)
+            encoding = guess_encoding(remote_csv.body.read(SNIFF_SIZE))
+        remote_csv.body.seek(bom_length)
+        remote_deck = build_remote_deck_from_csv(
+            iter_csv_rows(remote_csv.body, encoding, errors="replace"),
+            note_type_name,
+            note_type_fields,
+            progress,
+            tags_column,
+            tag_separator,
+            column_mapping,
+        )
 
-    data = parse_csv_data(csv_data)
-    remote_deck = build_remote_deck_from_csv(data, note_type_name, note_type_fields)
+    remote_deck.etag = remote_csv.etag
+    remote_deck.last_modified = remote_csv.last_modified
+    remote_deck.encoding = encoding
     return remote_deck
 
 
+def build_appended_remote_deck(
+    remote_csv: RemoteCsv,
+    note_type_name: str,
+    note_type_fields: list[str],
+    start: int,
+    progress: Optional[SyncProgress] = None,
+    preferred_encoding: Optional[str] = None,
+    tags_column: Optional[str] = None,
+    tag_separator: str = DEFAULT_TAG_SEPARATOR,
+    column_mapping: Optional[dict] = None,
+) -> Optional[RemoteDeck]:
+    """Parses only the rows after the first start bytes of a downloaded CSV.
+
+    Meant for a sheet that starts with exactly the bytes synced last time, see
+    download_remote_csv. The header row is read again so the new rows can be
+    mapped to fields.
+
+    Args:
+        remote_csv (RemoteCsv): A successful download.
+        note_type_name (str): The name of the note type.
+        note_type_fields (list[str]): List of fields in the note type.
+        start (int): Length of the part of the file already synced.
+        progress (SyncProgress, optional): Receives row progress and signals cancellation. Defaults to None.
+        preferred_encoding (str, optional): Encoding detected for the deck last time. Defaults to None.
+        tags_column (str, optional): Header of the optional tags column. Defaults to None.
+        tag_separator (str, optional): What separates two tags in that column.
+            Defaults to DEFAULT_TAG_SEPARATOR.
+        column_mapping (dict, optional): Which column each field is read from. Defaults to None.
+    Returns:
+        Optional[RemoteDeck]: The new rows, or None if they cannot be parsed on their own and
+            the whole file must be parsed instead.
+    """
+    body = remote_csv.body
+    encoding, bom_length = detect_encoding(body, preferred_encoding)
+    if "\n".encode(encoding) != b"\n" or start <= bom_length:
+        # Line breaks are not single bytes, so the offset may not be a row boundary
+        return None
+
+    # The old content must have ended a row, or the new content start one
+    body.seek(start - 1)
+    boundary = body.read(2)
+    if boundary[:1] not in (b"\n", b"\r") and boundary[1:] not in (b"\n", b"\r"):
+        return None
+
+    try:
+        body.seek(bom_length)
+        rows = iter_csv_rows(body, encoding)
+        headers = next(rows, None)
+        rows.close()
+        if headers is None:
+            return None
+
+        body.seek(start)
+        remote_deck = build_remote_deck_from_csv(
+            itertools.chain([headers], iter_csv_rows(body, encoding)),
+            note_type_name,
+            note_type_fields,
+            progress,
+            tags_column,
+            tag_separator,
+            column_mapping,
+        )
+    except UnicodeDecodeError:
+        return None
+
+    remote_deck.etag = remote_csv.etag
+    remote_deck.last_modified = remote_csv.last_modified
+    remote_deck.encoding = encoding
+    return remote_deck
+
+
+def iter_csv_rows(
+    stream: BinaryIO, encoding: str = "utf-8", errors: str = "strict"
+) -> Iterator[list[str]]:
+    """Lazily decodes and parses CSV rows from a binary stream.
+
+    Decoding is incremental and quoted cells spanning several lines are kept
+    whole, so only the row being parsed is held in memory.
+
+    Args:
+        stream (BinaryIO): The raw CSV bytes, positioned after any byte order mark.
+        encoding (str, optional): The encoding of the bytes. Defaults to "utf-8".
+        errors (str, optional): How to handle undecodable bytes. Defaults to "strict".
+    Returns:
+        Iterator[list[str]]: The rows, each row being a list of strings.
+    """
+    text = io.TextIOWrapper(stream, encoding=encoding, errors=errors, newline="")
+    try:
+        yield from csv.reader(text)
+    finally:
+        # The caller owns the stream, so it must outlive the wrapper
+        text.detach()
+
+
+def build_conditional_headers(
+    etag: Optional[str] = None, last_modified: Optional[str] = None
+) -> dict[str, str]:
+    """Builds the request headers that make a download conditional.
+
+    Args:
+        etag (str, optional): ETag returned by the last download. Defaults to None.
+        last_modified (str, optional): Last-Modified returned by the last download. Defaults to None.
+    Returns:
+        dict[str, str]: The If-None-Match / If-Modified-Since headers to send.
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+
 def parse_csv_data(csv_data: Union[str, any]) -> list[list[str]]:
     """Parses CSV data from a string.
 
@@ -38,74 +317,90 @@ def parse_csv_data(csv_data: Union[str, any]) -> list[list[str]]:
     Returns:
         list[list[str]]: Parsed CSV data as a list of rows, each row being a list of strings.
     """
-    print("Parsing CSV data...")  # Debug message
-    reader = csv.reader(csv_data.splitlines())
+    logger.debug("Parsing CSV data")
+    reader = csv.reader(io.StringIO(csv_data, newline=""))
     data = list(reader)
     return data
 
 
 def build_remote_deck_from_csv(
-    data: list[list[str]], note_type_name: str, note_type_fields: list[str]
+    data: Iterable[list[str]],
+    note_type_name: str,
+    note_type_fields: list[str],
+    progress: Optional[SyncProgress] = None,
+    tags_column: Optional[str] = None,
+    tag_separator: str = DEFAULT_TAG_SEPARATOR,
+    column_mapping: Optional[dict] = None,
 ) -> RemoteDeck:
     """Builds a RemoteDeck object from parsed CSV data.
 
     Args:
-        data (list[list[str]]): Parsed CSV data.
+        data (Iterable[list[str]]): Parsed CSV data, header row first. May be a lazy iterator.
         note_type_name (str): The name of the note type.
         note_type_fields (list[str]): List of fields in the note type.
+        progress (SyncProgress, optional): Receives row progress and signals cancellation. Defaults to None.
+        tags_column (str, optional): Header of the optional column holding the tags of each row,
+            unless the note type has a field of that name. Defaults to None.
+        tag_separator (str, optional): What separates two tags in that column, see split_tags.
+            Defaults to DEFAULT_TAG_SEPARATOR.
+        column_mapping (dict, optional): Which column each field is read from, see
+            compile_row_projector. Without one, the headers must be the fields of the note
+            type. Defaults to None.
     Returns:
         RemoteDeck: The constructed RemoteDeck object.
     """
-    original_headers = data[0]  # first row of data
+    rows = iter(data)
+    original_headers = next(rows, None)  # first row of data
+    if original_headers is None:
+        raise Exception("The CSV is empty.")
     headers = [h.strip() for h in original_headers]
-    print("Headers:", headers)  # Debug message
+    logger.debug("Headers: %s", headers)
 
-    if set(headers) != set([x.strip() for x in note_type_fields]):
-        print("Warning: CSV headers do not match note type fields.")  # Debug message
-        print("Note type fields:", note_type_fields)  # Debug message
-        raise Exception(
-            f"CSV headers do not match note type fields.\nheaders:{original_headers}\nrequired note type fields:{note_type_fields}"
-        )
+    if tags_column in [x.strip() for x in note_type_fields]:
+        tags_column = None
+    field_names, project = compile_row_projector(
+        headers, note_type_fields, column_mapping, [tags_column]
+    )
 
-    header_indices = {header: idx for idx, header in enumerate(headers)}
+    tags_index = headers.index(tags_column) if tags_column in headers else None
+    # The tags of each distinct cell, shared by the rows that repeat it
+    tags_by_text: dict[str, tuple[str, ...]] = {}
 
-    for field_name, idx in header_indices.items():
-        print(f"Header '{field_name}' found at index {idx}")  # Debug message
+    # Checked once rather than for every row
+    log_rows = logger.isEnabledFor(logging.DEBUG)
 
     notecards = []
-    for row_num, row in enumerate(data[1:], start=2):  # Start at line 2 (after headers)
-        print(f"Processing row {row_num}: {row}")  # Debug message
+    for row_num, row in enumerate(rows, start=2):  # Start at line 2 (after headers)
+        if log_rows:
+            logger.debug("Processing row %d: %s", row_num, row)
+
+        if progress is not None and row_num % PROGRESS_INTERVAL == 0:
+            progress.raise_if_cancelled()
+            progress.advance_rows(PROGRESS_INTERVAL)
 
+        values = project(row)
         # Skip empty rows
-        if not any(cell.strip() for cell in row):
-            print(f"Row {row_num} skipped because it is empty")
+        if values is None:
+            if log_rows:
+                logger.debug("Row %d skipped because it is empty", row_num)
             continue
 
-        fields = {}
-        for field_name, idx in header_indices.items():
-            try:
-                fields[field_name] = row[idx].strip() if idx < len(row) else ""
-            except IndexError:
-                print(f"Row {row_num} skipped due to field {field_name}")
-                continue
-
         # Get tags if available
-        tags = []
-        # tag_text = ''
-        # if tag_index is not None and tag_index < len(row):
-        #     tag_text = row[tag_index].strip()
-        # tags = tag_text.split('::') if tag_text else []
-        # tags = [tag.strip() for tag in tags if tag.strip()]
-
-        # Create note card dictionary
-        notecard = {"type": note_type_name, "fields": fields, "tags": tags}
+        tags = None
+        if tags_index is not None:
+            tag_text = row[tags_index] if tags_index < len(row) else ""
+            tags = tags_by_text.get(tag_text)
+            if tags is None:
+                tags = tags_by_text[tag_text] = split_tags(tag_text, tag_separator)
+
+        notecard = Notecard(values, tags)
         notecards.append(notecard)
-        print(f"Added notecard: {notecard['fields']}")  # Debug message
 
     remote_deck = RemoteDeck()
     remote_deck.deck_name = "Deck from CSV"
     remote_deck.notecards = notecards
+    remote_deck.field_names = field_names
 
-    print(f"Total questions added: {len(notecards)}")  # Debug message
+    logger.debug("Total questions added: %d", len(notecards))
 
     return remote_deck
@@ -0,0 +1,129 @@
+"""Automatic background sync of remote decks on a timer.
+
+The scheduler wakes up every "interval-minutes" (plus or minus a random
+jitter, so several Anki instances or add-ons do not all hit the network at
+the same moment) and quietly syncs the decks that are due. A deck that keeps
+failing is retried with exponential back-off instead of on every run. A
+sync that is still running when the user starts reviewing holds its writes
+to the collection until the review is over.
+"""
+
+import random
+import time
+from typing import Optional
+
+from aqt import mw
+from aqt.qt import QTimer
+from aqt.utils import qconnect
+
+from .main import is_sync_running, sync_decks
+from .models.sync_summary import SyncSummary
+
+DEFAULT_SETTINGS = {
+    "enabled": False,
+    "interval-minutes": 60,
+    "jitter-minutes": 5,
+    "max-backoff-hours": 24,
+}
+
+# How long to wait before checking again while the user is reviewing
+BUSY_RETRY_SECONDS = 60
+
+
+class AutoSyncScheduler:
+    def __init__(self):
+        self.timer: Optional[QTimer] = None
+        # Consecutive failures and monotonic time of the next attempt, by deck URL
+        self.failures: dict[str, int] = {}
+        self.retry_at: dict[str, float] = {}
+        # Decks included in the sync currently running
+        self.running_urls: list[str] = []
+
+    def get_settings(self) -> dict:
+        config = mw.addonManager.getConfig(__name__) or {}
+        settings = dict(DEFAULT_SETTINGS)
+        settings.update(config.get("auto-sync", {}))
+        return settings
+
+    def start(self) -> None:
+        """Starts the timer if automatic sync is enabled in the config."""
+        self.stop()
+        if not self.get_settings()["enabled"]:
+            return
+        self.timer = QTimer(mw)
+        self.timer.setSingleShot(True)
+        qconnect(self.timer.timeout, self.on_timeout)
+        self.schedule_next()
+
+    def stop(self) -> None:
+        if self.timer is not None:
+            self.timer.stop()
+            self.timer.deleteLater()
+            self.timer = None
+
+    def schedule_next(self, delay_seconds: Optional[float] = None) -> None:
+        """Arms the timer for the next run.
+
+        Args:
+            delay_seconds (float, optional): Seconds until the next run. Defaults to the
+                configured interval with random jitter applied.
+        """
+        if self.timer is None:
+            return
+        if delay_seconds is None:
+            settings = self.get_settings()
+            jitter = settings["jitter-minutes"] * 60
+            delay_seconds = settings["interval-minutes"] * 60
+            delay_seconds += random.uniform(-jitter, jitter)
+        self.timer.start(int(max(delay_seconds, BUSY_RETRY_SECONDS) * 1000))
+
+    def on_timeout(self) -> None:
+        if mw.col is None or mw.state == "review" or is_sync_running():
+            # Never compete with a study session or another sync
+            self.schedule_next(BUSY_RETRY_SECONDS)
+            return
+
+        deck_urls = self.get_due_deck_urls()
+        if not deck_urls:
+            self.schedule_next()
+            return
+        self.running_urls = deck_urls
+        sync_decks(deck_urls=deck_urls, quiet=True, on_done=self.on_sync_done)
+
+    def get_due_deck_urls(self) -> list[str]:
+        """Returns the URLs of the linked decks that are not backing off."""
+        config = mw.addonManager.getConfig(__name__) or {}
+        now = time.monotonic()
+        return [
+            info["url"]
+            for info in config.get("remote-decks", {}).values()
+            if self.retry_at.get(info["url"], 0) <= now
+        ]
+
+    def on_sync_done(self, summary: Optional[SyncSummary]) -> None:
+        if summary is not None:
+            self.record_results(summary)
+        self.schedule_next()
+
+    def record_results(self, summary: SyncSummary) -> None:
+        """Updates the back-off of every deck from the outcome of a sync.
+
+        Args:
+            summary (SyncSummary): What happened to each deck.
+        """
+        settings = self.get_settings()
+        interval = settings["interval-minutes"] * 60
+        max_backoff = settings["max-backoff-hours"] * 3600
+        now = time.monotonic()
+
+        failed_urls = set(summary.failed_urls)
+        for url in failed_urls:
+            self.failures[url] = self.failures.get(url, 0) + 1
+            backoff = min(max_backoff, interval * 2 ** self.failures[url])
+            self.retry_at[url] = now + backoff * random.uniform(0.5, 1.0)
+
+        # Any deck of this sync that did not fail is healthy again
+        for url in self.running_urls:
+            if url not in failed_urls:
+                self.failures.pop(url, None)
+                self.retry_at.pop(url, None)
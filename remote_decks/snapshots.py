@@ -0,0 +1,164 @@
+"""Compressed on-disk copies of the last CSV downloaded for each remote deck.
+
+Snapshots live in the add-on's user_files folder, which Anki keeps when the
+add-on is updated. They let a sync fall back to the last known sheet when the
+network is unavailable, and let decks be rebuilt locally after a change to
+their note type or key field.
+
+Next to each snapshot, the hashes of the rows applied by the last successful
+sync are kept so the next sync only has to write the rows that changed.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Optional
+
+from .models.remote_csv import RemoteCsv
+
+ADDON_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNAPSHOTS_PATH = os.path.join(ADDON_PATH, "user_files", "snapshots")
+
+# Size of the blocks copied between files
+CHUNK_SIZE = 64 * 1024
+
+
+def get_snapshot_path(url: str) -> str:
+    """Returns the snapshot file of a remote deck.
+
+    Args:
+        url (str): The URL of the remote deck.
+    Returns:
+        str: The path of its compressed snapshot.
+    """
+    name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(SNAPSHOTS_PATH, f"{name}.csv.gz")
+
+
+def get_row_hashes_path(url: str) -> str:
+    """Returns the file holding the row hashes of a remote deck.
+
+    Args:
+        url (str): The URL of the remote deck.
+    Returns:
+        str: The path of its compressed row hashes.
+    """
+    name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(SNAPSHOTS_PATH, f"{name}.rows.json.gz")
+
+
+def has_snapshot(url: str) -> bool:
+    return os.path.isfile(get_snapshot_path(url))
+
+
+def save_snapshot(url: str, remote_csv: RemoteCsv) -> None:
+    """Compresses a download into the snapshot of its deck.
+
+    The snapshot is replaced atomically so a failed write never leaves a
+    truncated file behind. The body of remote_csv is rewound afterwards.
+
+    Args:
+        url (str): The URL of the remote deck.
+        remote_csv (RemoteCsv): A successful download.
+    """
+    os.makedirs(SNAPSHOTS_PATH, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=SNAPSHOTS_PATH, suffix=".tmp")
+    try:
+        with (
+            os.fdopen(fd, "wb") as file,
+            gzip.GzipFile(fileobj=file, mode="wb") as snapshot,
+        ):
+            remote_csv.body.seek(0)
+            shutil.copyfileobj(remote_csv.body, snapshot, CHUNK_SIZE)
+        os.replace(temp_path, get_snapshot_path(url))
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    finally:
+        remote_csv.body.seek(0)
+
+
+def load_snapshot(url: str) -> Optional[RemoteCsv]:
+    """Opens the snapshot of a remote deck as if it had just been downloaded.
+
+    Args:
+        url (str): The URL of the remote deck.
+    Returns:
+        Optional[RemoteCsv]: The snapshot, or None if the deck has none. The caller must close it.
+    """
+    path = get_snapshot_path(url)
+    if not os.path.isfile(path):
+        return None
+
+    remote_csv = RemoteCsv()
+    remote_csv.body = gzip.open(path, "rb")
+    try:
+        content_hash = hashlib.sha256()
+        for chunk in iter(lambda: remote_csv.body.read(CHUNK_SIZE), b""):
+            content_hash.update(chunk)
+            remote_csv.content_length += len(chunk)
+        remote_csv.content_hash = content_hash.hexdigest()
+        remote_csv.body.seek(0)
+    except Exception:
+        remote_csv.close()
+        raise
+    return remote_csv
+
+
+def save_row_hashes(url: str, config_hash: str, row_hashes: dict[str, str]) -> None:
+    """Records the rows applied to the collection by a successful sync.
+
+    Args:
+        url (str): The URL of the remote deck.
+        config_hash (str): Digest of the note configuration the rows were applied with.
+        row_hashes (dict[str, str]): Hash of every row, by key.
+    """
+    os.makedirs(SNAPSHOTS_PATH, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=SNAPSHOTS_PATH, suffix=".tmp")
+    try:
+        with (
+            os.fdopen(fd, "wb") as file,
+            gzip.GzipFile(fileobj=file, mode="wb") as rows_file,
+        ):
+            data = {"config_hash": config_hash, "rows": row_hashes}
+            rows_file.write(json.dumps(data).encode("utf-8"))
+        os.replace(temp_path, get_row_hashes_path(url))
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def load_row_hashes(url: str, config_hash: str) -> Optional[dict[str, str]]:
+    """Reads the rows applied to the collection by the last successful sync.
+
+    Args:
+        url (str): The URL of the remote deck.
+        config_hash (str): Digest of the current note configuration of the deck.
+    Returns:
+        Optional[dict[str, str]]: Hash of every row by key, or None if there is no
+            record for this note configuration.
+    """
+    try:
+        with gzip.open(get_row_hashes_path(url), "rb") as rows_file:
+            data = json.loads(rows_file.read().decode("utf-8"))
+    except (OSError, ValueError):
+        return None
+    if data.get("config_hash") != config_hash:
+        return None
+    return data["rows"]
+
+
+def delete_snapshot(url: str) -> None:
+    """Removes the snapshot and row hashes of a remote deck, if any.
+
+    Args:
+        url (str): The URL of the remote deck.
+    """
+    for path in (get_snapshot_path(url), get_row_hashes_path(url)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
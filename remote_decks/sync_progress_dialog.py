@@ -0,0 +1,91 @@
+from aqt.qt import (
+    QDialog,
+    QLabel,
+    QProgressBar,
+    QPushButton,
+    Qt,
+    QTimer,
+    QVBoxLayout,
+    QWidget,
+)
+from aqt.utils import qconnect
+
+from .models.sync_progress import SyncProgress
+
+try:
+    application_modal = Qt.WindowModality.ApplicationModal
+except AttributeError:
+    application_modal = Qt.ApplicationModal
+
+REFRESH_INTERVAL_MS = 100
+
+
+class SyncProgressDialog(QDialog):
+    """Window showing per-deck and per-row progress of a sync with a Cancel button.
+
+    The dialog polls a SyncProgress on a timer, so background workers never
+    have to touch Qt objects themselves.
+    """
+
+    def __init__(self, parent: QWidget, progress: SyncProgress):
+        super().__init__(parent)
+        self.progress = progress
+
+        self.setWindowTitle("sheets2anki")
+        self.setWindowModality(application_modal)
+        self.setMinimumWidth(400)
+
+        self.phase_label = QLabel()
+        self.deck_label = QLabel()
+        self.deck_bar = QProgressBar()
+        self.row_label = QLabel()
+        self.row_bar = QProgressBar()
+        self.cancel_button = QPushButton("Cancel")
+        qconnect(self.cancel_button.clicked, self.cancel)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.phase_label)
+        layout.addWidget(self.deck_label)
+        layout.addWidget(self.deck_bar)
+        layout.addWidget(self.row_label)
+        layout.addWidget(self.row_bar)
+        layout.addWidget(self.cancel_button)
+        self.setLayout(layout)
+
+        self.timer = QTimer(self)
+        qconnect(self.timer.timeout, self.refresh)
+        self.timer.start(REFRESH_INTERVAL_MS)
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Copies the current state of the sync into the widgets."""
+        phase, deck_name, decks_done, decks_total, rows_done, rows_total = (
+            self.progress.get_state()
+        )
+        if self.progress.is_cancelled():
+            phase = "Cancelling..."
+        self.phase_label.setText(phase)
+        self.deck_label.setText(f"Deck {decks_done} of {decks_total}: {deck_name}")
+        self.deck_bar.setRange(0, max(decks_total, 1))
+        self.deck_bar.setValue(decks_done)
+        if rows_total:
+            self.row_label.setText(f"Row {rows_done} of {rows_total}")
+        else:
+            self.row_label.setText(f"Rows processed: {rows_done}")
+        # A zero maximum shows a busy indicator while the total is unknown
+        self.row_bar.setRange(0, rows_total)
+        self.row_bar.setValue(min(rows_done, rows_total))
+
+    def cancel(self) -> None:
+        self.progress.cancel()
+        self.cancel_button.setEnabled(False)
+        self.refresh()
+
+    def reject(self) -> None:
+        # Closing the window with Escape or the title bar cancels the sync
+        self.cancel()
+
+    def finish(self) -> None:
+        """Stops polling and closes the window once the sync is over."""
+        self.timer.stop()
+        super().accept()
@@ -0,0 +1,48 @@
+"""The undo step that the changes of a sync are grouped under.
+
+A sync gives control back to Qt between chunks, so the user may change or
+undo something in the middle of it. Changes are only merged into the step
+while it is still the last one on the undo stack. Otherwise the next change
+starts a new step, so undoing the sync never undoes what the user did in
+between, and a step the user already undid is never merged into.
+"""
+
+from typing import Optional
+
+from anki.collection import Collection
+
+# Shown as "Undo sheets2anki sync" in the Edit menu
+UNDO_ENTRY_NAME = "sheets2anki sync"
+
+
+class SyncUndoEntry:
+    def __init__(self, col: Collection):
+        self.col = col
+        # Undo step the changes are merged into, started by the first change
+        self.step: Optional[int] = None
+        # Whether changes were made since the last merge
+        self.pending = False
+        # Whether a step was let go of, since the user may have undone part of it
+        self.interrupted = False
+
+    def begin(self) -> None:
+        """Makes sure there is a step to merge into, before changing the collection."""
+        if self.step is None:
+            self.step = self.col.add_custom_undo_entry(UNDO_ENTRY_NAME)
+        self.pending = True
+
+    def merge(self) -> None:
+        """Merges the changes made since begin into the step."""
+        if self.pending:
+            self.col.merge_undo_entries(self.step)
+            self.pending = False
+
+    def resume(self) -> None:
+        """Lets go of the step if the undo stack changed while Qt had control."""
+        if (
+            self.step is not None
+            and not self.pending
+            and self.col.undo_status().last_step != self.step
+        ):
+            self.step = None
+            self.interrupted = True
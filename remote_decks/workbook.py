@@ -0,0 +1,303 @@
+"""Reading the tabs of a spreadsheet downloaded as a whole, in xlsx format.
+
+Google Sheets can publish a whole spreadsheet as a single xlsx file, so decks
+made from several tabs of the same spreadsheet are fetched with one request
+instead of one per tab. The file is read with zipfile and ElementTree only.
+Each tab is streamed into a CSV laid out like the one published for that tab
+alone, so the rest of the sync handles it like any other download.
+
+Cells are read as stored: text as typed, numbers without their display
+format, and dates as serial numbers.
+
+To look at a local file, run from the root of the repository:
+
+    python -m remote_decks.workbook spreadsheet.xlsx [tab name]
+"""
+
+import csv
+import hashlib
+import io
+import posixpath
+import re
+import sys
+import tempfile
+import zipfile
+from typing import BinaryIO, Iterator, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from xml.etree import ElementTree
+
+from .models.remote_csv import RemoteCsv
+
+MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+RELATIONSHIP_NS = (
+    "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+)
+PACKAGE_RELATIONSHIP_NS = (
+    "{http://schemas.openxmlformats.org/package/2006/relationships}"
+)
+
+WORKBOOK_PATH = "xl/workbook.xml"
+WORKBOOK_RELS_PATH = "xl/_rels/workbook.xml.rels"
+SHARED_STRINGS_PATH = "xl/sharedStrings.xml"
+
+# Query parameters of a published CSV that select a single tab
+SINGLE_SHEET_PARAMS = {"gid", "single", "output", "range"}
+
+# Size of the blocks hashed
+CHUNK_SIZE = 64 * 1024
+
+CELL_REF_PATTERN = re.compile(r"([A-Z]+)(\d*)")
+
+
+class Workbook:
+    """A downloaded xlsx file whose tabs can be extracted as CSV one by one."""
+
+    def __init__(self, body: BinaryIO):
+        """Opens the workbook and reads what all its tabs share.
+
+        Args:
+            body (BinaryIO): The raw xlsx bytes, seekable. The caller keeps ownership of it.
+        Raises:
+            Exception: If the file is not an xlsx workbook.
+        """
+        try:
+            self.archive = zipfile.ZipFile(body)
+            self.sheet_paths = read_sheet_paths(self.archive)
+            self.shared_strings = read_shared_strings(self.archive)
+        except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as e:
+            raise Exception(f"The spreadsheet is not a valid xlsx file: {e}")
+
+    def close(self) -> None:
+        self.archive.close()
+
+    def get_sheet_names(self) -> list[str]:
+        return list(self.sheet_paths)
+
+    def iter_sheet_rows(self, sheet_name: str) -> Iterator[list[str]]:
+        """Lazily reads the rows of a tab, as the csv module would parse its CSV.
+
+        Args:
+            sheet_name (str): The name of the tab.
+        Returns:
+            Iterator[list[str]]: The rows, each row being a list of strings.
+        Raises:
+            Exception: If the workbook has no tab of that name.
+        """
+        path = self.sheet_paths.get(sheet_name)
+        if path is None:
+            raise Exception(
+                f"The spreadsheet has no sheet named {sheet_name!r}. "
+                f"Sheets: {', '.join(self.sheet_paths)}"
+            )
+        with self.archive.open(path) as sheet:
+            yield from iter_sheet_xml_rows(sheet, self.shared_strings)
+
+    def extract_sheet(
+        self, sheet_name: str, prefix_length: Optional[int] = None
+    ) -> RemoteCsv:
+        """Writes a tab out as a UTF-8 CSV, as if it had been downloaded on its own.
+
+        Args:
+            sheet_name (str): The name of the tab.
+            prefix_length (int, optional): Also hash the first prefix_length bytes, see
+                download_remote_csv. Defaults to None.
+        Returns:
+            RemoteCsv: The CSV of the tab. The caller must close it.
+        """
+        remote_csv = RemoteCsv()
+        remote_csv.body = tempfile.TemporaryFile()
+        try:
+            text = io.TextIOWrapper(remote_csv.body, encoding="utf-8", newline="")
+            csv.writer(text).writerows(self.iter_sheet_rows(sheet_name))
+            text.flush()
+            # The caller owns the file, so it must outlive the wrapper
+            text.detach()
+            hash_remote_csv(remote_csv, prefix_length)
+        except BaseException:
+            remote_csv.close()
+            raise
+        return remote_csv
+
+
+def get_workbook_url(url: str) -> str:
+    """Turns the published CSV URL of a tab into that of the whole spreadsheet as xlsx.
+
+    Args:
+        url (str): The published CSV URL of one tab.
+    Returns:
+        str: The URL of the xlsx export of the spreadsheet.
+    """
+    parts = urlsplit(url)
+    params = [
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name not in SINGLE_SHEET_PARAMS
+    ]
+    params.append(("output", "xlsx"))
+    return urlunsplit(parts._replace(query=urlencode(params), fragment=""))
+
+
+def read_sheet_paths(archive: zipfile.ZipFile) -> dict[str, str]:
+    """Finds the part of the archive holding each tab.
+
+    Args:
+        archive (zipfile.ZipFile): The xlsx file.
+    Returns:
+        dict[str, str]: The path in the archive of every tab, by tab name, in tab order.
+    """
+    targets = {}
+    relationships = ElementTree.fromstring(archive.read(WORKBOOK_RELS_PATH))
+    for relationship in relationships.iter(f"{PACKAGE_RELATIONSHIP_NS}Relationship"):
+        target = relationship.get("Target", "")
+        if target.startswith("/"):
+            target = target.lstrip("/")
+        else:
+            target = posixpath.normpath(posixpath.join("xl", target))
+        targets[relationship.get("Id")] = target
+
+    workbook = ElementTree.fromstring(archive.read(WORKBOOK_PATH))
+    sheet_paths = {}
+    for sheet in workbook.iter(f"{MAIN_NS}sheet"):
+        target = targets.get(sheet.get(f"{RELATIONSHIP_NS}id"))
+        if target is not None:
+            sheet_paths[sheet.get("name")] = target
+    return sheet_paths
+
+
+def read_shared_strings(archive: zipfile.ZipFile) -> list[str]:
+    """Reads the strings that text cells refer to by index.
+
+    Args:
+        archive (zipfile.ZipFile): The xlsx file.
+    Returns:
+        list[str]: The shared strings, empty if the workbook has none.
+    """
+    if SHARED_STRINGS_PATH not in archive.namelist():
+        return []
+    shared_strings = []
+    with archive.open(SHARED_STRINGS_PATH) as file:
+        for _, element in ElementTree.iterparse(file):
+            if element.tag == f"{MAIN_NS}si":
+                shared_strings.append(read_rich_text(element))
+                element.clear()
+    return shared_strings
+
+
+def read_rich_text(element: ElementTree.Element) -> str:
+    """Joins the text of a string item, plain or made of formatted runs.
+
+    Args:
+        element (ElementTree.Element): An <si> or <is> element.
+    Returns:
+        str: Its text, without phonetic hints.
+    """
+    parts = []
+    for child in element:
+        if child.tag == f"{MAIN_NS}t":
+            parts.append(child.text or "")
+        elif child.tag == f"{MAIN_NS}r":
+            run_text = child.find(f"{MAIN_NS}t")
+            if run_text is not None:
+                parts.append(run_text.text or "")
+    return "".join(parts)
+
+
+def iter_sheet_xml_rows(
+    sheet: BinaryIO, shared_strings: list[str]
+) -> Iterator[list[str]]:
+    """Streams the rows of a worksheet part, releasing each row once read.
+
+    Args:
+        sheet (BinaryIO): The worksheet XML.
+        shared_strings (list[str]): The shared strings of the workbook.
+    Returns:
+        Iterator[list[str]]: The rows. Rows left out of the file because they are empty
+            come out as empty lists, and missing cells as empty strings.
+    """
+    next_row_number = 1
+    for _, element in ElementTree.iterparse(sheet):
+        if element.tag != f"{MAIN_NS}row":
+            continue
+        row_number = int(element.get("r", next_row_number))
+        for _ in range(next_row_number, row_number):
+            yield []
+        next_row_number = row_number + 1
+
+        row: list[str] = []
+        for cell in element.iter(f"{MAIN_NS}c"):
+            match = CELL_REF_PATTERN.match(cell.get("r", ""))
+            if match:
+                column = get_column_index(match.group(1))
+                if column > len(row):
+                    row.extend([""] * (column - len(row)))
+            row.append(read_cell_value(cell, shared_strings))
+        element.clear()
+        yield row
+
+
+def get_column_index(letters: str) -> int:
+    """Converts column letters to a 0-based index, "A" being 0 and "AA" 26."""
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index - 1
+
+
+def read_cell_value(cell: ElementTree.Element, shared_strings: list[str]) -> str:
+    """Reads the value of a cell as text.
+
+    Args:
+        cell (ElementTree.Element): A <c> element.
+        shared_strings (list[str]): The shared strings of the workbook.
+    Returns:
+        str: The value, as the CSV export would write it for text and booleans.
+    """
+    cell_type = cell.get("t")
+    if cell_type == "inlineStr":
+        inline = cell.find(f"{MAIN_NS}is")
+        return read_rich_text(inline) if inline is not None else ""
+
+    value = cell.find(f"{MAIN_NS}v")
+    text = value.text if value is not None and value.text is not None else ""
+    if cell_type == "s":
+        return shared_strings[int(text)] if text else ""
+    if cell_type == "b":
+        return "TRUE" if text == "1" else "FALSE"
+    return text
+
+
+def hash_remote_csv(remote_csv: RemoteCsv, prefix_length: Optional[int]) -> None:
+    """Fills in the length and hashes of a body written locally, and rewinds it.
+
+    Args:
+        remote_csv (RemoteCsv): The CSV, its body holding every byte.
+        prefix_length (int, optional): Also hash the first prefix_length bytes.
+    """
+    body = remote_csv.body
+    body.seek(0)
+    content_hash = hashlib.sha256()
+    prefix_hash = hashlib.sha256() if prefix_length else None
+    position = 0
+    for chunk in iter(lambda: body.read(CHUNK_SIZE), b""):
+        content_hash.update(chunk)
+        if prefix_hash is not None and position < prefix_length:
+            prefix_hash.update(chunk[: prefix_length - position])
+        position += len(chunk)
+    remote_csv.content_hash = content_hash.hexdigest()
+    remote_csv.content_length = position
+    if prefix_hash is not None and position >= prefix_length:
+        remote_csv.prefix_hash = prefix_hash.hexdigest()
+    body.seek(0)
+
+
+if __name__ == "__main__":
+    with open(sys.argv[1], "rb") as file:
+        workbook = Workbook(file)
+        try:
+            names = sys.argv[2:] or workbook.get_sheet_names()
+            for name in names:
+                print(f"== {name}")
+                for row in workbook.iter_sheet_rows(name):
+                    print(row)
+        finally:
+            workbook.close()
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Make the vendored libraries importable, as the add-on does when Anki loads it
+libs_path = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), "remote_decks", "libs"
+)
+if libs_path not in sys.path:
+    sys.path.insert(0, libs_path)
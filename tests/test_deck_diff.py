@@ -0,0 +1,109 @@
+import unittest
+
+from remote_decks.deck_diff import (
+    compute_row_hash,
+    diff_appended_rows,
+    diff_remote_deck,
+)
+from remote_decks.models.notecard import Notecard
+from remote_decks.models.remote_deck import RemoteDeck
+
+FIELD_NAMES = ["Front", "Back"]
+
+
+def make_remote_deck(rows, tags=None, field_names=FIELD_NAMES):
+    remote_deck = RemoteDeck()
+    remote_deck.field_names = list(field_names)
+    remote_deck.notecards = [Notecard(tuple(row), tags) for row in rows]
+    return remote_deck
+
+
+def get_keys(notecards):
+    return [notecard.values[0] for notecard in notecards]
+
+
+class ComputeRowHashTest(unittest.TestCase):
+    def test_ignores_column_order(self):
+        self.assertEqual(
+            compute_row_hash(Notecard(("q", "a")), ["Front", "Back"]),
+            compute_row_hash(Notecard(("a", "q")), ["Back", "Front"]),
+        )
+
+    def test_depends_on_values_and_tags(self):
+        row_hash = compute_row_hash(Notecard(("q", "a")), FIELD_NAMES)
+        self.assertNotEqual(
+            row_hash, compute_row_hash(Notecard(("q", "b")), FIELD_NAMES)
+        )
+        self.assertNotEqual(
+            row_hash, compute_row_hash(Notecard(("q", "a"), ("tag",)), FIELD_NAMES)
+        )
+
+    def test_no_tags_column_hashes_like_no_tags(self):
+        self.assertEqual(
+            compute_row_hash(Notecard(("q", "a")), FIELD_NAMES),
+            compute_row_hash(Notecard(("q", "a"), ()), FIELD_NAMES),
+        )
+
+
+class DiffRemoteDeckTest(unittest.TestCase):
+    def test_without_previous_hashes_every_row_is_added(self):
+        remote_deck_diff = diff_remote_deck(
+            make_remote_deck([("q1", "a1"), ("q2", "a2")]), "Front"
+        )
+        self.assertEqual(get_keys(remote_deck_diff.added), ["q1", "q2"])
+        self.assertEqual(remote_deck_diff.changed, [])
+        self.assertEqual(remote_deck_diff.unchanged, [])
+        self.assertEqual(list(remote_deck_diff.row_hashes), ["q1", "q2"])
+
+    def test_added_changed_unchanged(self):
+        previous = diff_remote_deck(
+            make_remote_deck([("q1", "a1"), ("q2", "a2"), ("q3", "a3")]), "Front"
+        ).row_hashes
+        remote_deck_diff = diff_remote_deck(
+            make_remote_deck([("q1", "a1"), ("q2", "changed"), ("q4", "a4")]),
+            "Front",
+            previous,
+        )
+        self.assertEqual(get_keys(remote_deck_diff.added), ["q4"])
+        self.assertEqual(get_keys(remote_deck_diff.changed), ["q2"])
+        self.assertEqual(get_keys(remote_deck_diff.unchanged), ["q1"])
+        # Only the rows of the new version are hashed
+        self.assertEqual(sorted(remote_deck_diff.row_hashes), ["q1", "q2", "q4"])
+
+    def test_last_row_wins_for_a_repeated_key(self):
+        remote_deck_diff = diff_remote_deck(
+            make_remote_deck([("q1", "first"), ("q1", "last")]), "Front"
+        )
+        self.assertEqual(
+            [notecard.values for notecard in remote_deck_diff.added],
+            [("q1", "last")],
+        )
+
+    def test_key_field_in_another_column(self):
+        remote_deck_diff = diff_remote_deck(
+            make_remote_deck([("a1", "k1")], field_names=["Back", "Key"]), "Key"
+        )
+        self.assertEqual(list(remote_deck_diff.row_hashes), ["k1"])
+
+    def test_key_field_not_in_sheet(self):
+        with self.assertRaises(Exception):
+            diff_remote_deck(make_remote_deck([("q1", "a1")]), "Missing")
+
+
+class DiffAppendedRowsTest(unittest.TestCase):
+    def test_keeps_the_hashes_of_the_rows_above(self):
+        previous = diff_remote_deck(
+            make_remote_deck([("q1", "a1"), ("q2", "a2")]), "Front"
+        ).row_hashes
+        remote_deck_diff = diff_appended_rows(
+            make_remote_deck([("q3", "a3"), ("q1", "moved down")]), "Front", previous
+        )
+        self.assertEqual(get_keys(remote_deck_diff.added), ["q3"])
+        self.assertEqual(get_keys(remote_deck_diff.changed), ["q1"])
+        self.assertEqual(sorted(remote_deck_diff.row_hashes), ["q1", "q2", "q3"])
+        self.assertEqual(remote_deck_diff.row_hashes["q2"], previous["q2"])
+        self.assertNotEqual(remote_deck_diff.row_hashes["q1"], previous["q1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import codecs
+import io
+import unittest
+
+from remote_decks.decoding import SNIFF_SIZE, detect_encoding
+
+TEXT = "Front,Back\ncafé,déjà vu\n"
+
+
+class DetectEncodingTest(unittest.TestCase):
+    def test_utf8(self):
+        self.assertEqual(
+            detect_encoding(io.BytesIO(TEXT.encode("utf-8"))), ("utf-8", 0)
+        )
+
+    def test_utf8_before_the_remembered_encoding(self):
+        stream = io.BytesIO(TEXT.encode("utf-8"))
+        self.assertEqual(detect_encoding(stream, "cp1252"), ("utf-8", 0))
+
+    def test_remembered_encoding_instead_of_a_guess(self):
+        stream = io.BytesIO(TEXT.encode("cp1252"))
+        self.assertEqual(detect_encoding(stream, "latin-1"), ("latin-1", 0))
+
+    def test_cp1252(self):
+        stream = io.BytesIO(TEXT.encode("cp1252"))
+        self.assertEqual(detect_encoding(stream), ("cp1252", 0))
+
+    def test_utf8_bom_in_front_of_cp1252(self):
+        stream = io.BytesIO(codecs.BOM_UTF8 + TEXT.encode("cp1252"))
+        self.assertEqual(detect_encoding(stream), ("cp1252", len(codecs.BOM_UTF8)))
+
+    def test_utf16_bom(self):
+        stream = io.BytesIO(TEXT.encode("utf-16"))
+        self.assertEqual(detect_encoding(stream)[1], 2)
+        self.assertIn(detect_encoding(stream)[0], ("utf-16-le", "utf-16-be"))
+
+    def test_character_cut_at_the_end_of_the_prefix(self):
+        body = b"a" * (SNIFF_SIZE - 1) + "é".encode("utf-8")
+        self.assertEqual(detect_encoding(io.BytesIO(body)), ("utf-8", 0))
+
+    def test_rewinds_the_stream(self):
+        stream = io.BytesIO(TEXT.encode("utf-8"))
+        detect_encoding(stream)
+        self.assertEqual(stream.tell(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import codecs
+import io
+import unittest
+
+from remote_decks.models.remote_csv import RemoteCsv
+from remote_decks.parse_remote_deck import build_remote_deck_from_remote_csv
+
+FIELDS = ["Front", "Back"]
+
+
+def parse(body, preferred_encoding=None):
+    remote_csv = RemoteCsv()
+    remote_csv.body = io.BytesIO(body)
+    return build_remote_deck_from_remote_csv(
+        remote_csv, "Basic", FIELDS, preferred_encoding=preferred_encoding
+    )
+
+
+class DecodingTest(unittest.TestCase):
+    def test_utf8(self):
+        remote_deck = parse("Front,Back\ncafé,déjà vu\n".encode("utf-8"))
+        self.assertEqual(remote_deck.encoding, "utf-8")
+        self.assertEqual(remote_deck.notecards[0].values, ("café", "déjà vu"))
+
+    def test_utf8_bom_in_front_of_cp1252(self):
+        body = codecs.BOM_UTF8 + "Front,Back\ncafé,déjà vu\n".encode("cp1252")
+        remote_deck = parse(body)
+        self.assertEqual(remote_deck.encoding, "cp1252")
+        self.assertEqual(remote_deck.field_names, FIELDS)
+        self.assertEqual(remote_deck.notecards[0].values, ("café", "déjà vu"))
+
+    def test_bad_byte_after_a_utf8_prefix(self):
+        # Well past the part looked at to detect the encoding
+        rows = "".join(f"café {index},déjà vu\n" for index in range(4000))
+        body = ("Front,Back\n" + rows).encode("utf-8") + b"bad \xff byte,x\n"
+        remote_deck = parse(body)
+        self.assertEqual(remote_deck.encoding, "utf-8")
+        self.assertEqual(len(remote_deck.notecards), 4001)
+        self.assertEqual(remote_deck.notecards[0].values, ("café 0", "déjà vu"))
+        self.assertEqual(remote_deck.notecards[-1].values, ("bad � byte", "x"))
+
+    def test_utf8_even_if_cp1252_last_time(self):
+        remote_deck = parse("Front,Back\ncafé,naïve\n".encode("utf-8"), "cp1252")
+        self.assertEqual(remote_deck.encoding, "utf-8")
+        self.assertEqual(remote_deck.notecards[0].values, ("café", "naïve"))
+
+
+if __name__ == "__main__":
+    unittest.main()
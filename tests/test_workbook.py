@@ -0,0 +1,114 @@
+import csv
+import hashlib
+import io
+import os
+import unittest
+import zipfile
+
+from remote_decks.workbook import (
+    Workbook,
+    get_workbook_url,
+    iter_sheet_xml_rows,
+    read_shared_strings,
+    read_sheet_paths,
+)
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "workbook.xlsx")
+
+
+class ReadSheetPathsTest(unittest.TestCase):
+    def test_paths_by_tab_name_in_tab_order(self):
+        with zipfile.ZipFile(FIXTURE_PATH) as archive:
+            sheet_paths = read_sheet_paths(archive)
+        self.assertEqual(
+            list(sheet_paths.items()),
+            [
+                ("Vocab", "xl/worksheets/sheet1.xml"),
+                # Given as an absolute target in the relationships
+                ("Second tab", "xl/worksheets/sheet2.xml"),
+            ],
+        )
+
+
+class IterSheetXmlRowsTest(unittest.TestCase):
+    def read_rows(self, path):
+        with zipfile.ZipFile(FIXTURE_PATH) as archive:
+            shared_strings = read_shared_strings(archive)
+            with archive.open(path) as sheet:
+                return list(iter_sheet_xml_rows(sheet, shared_strings))
+
+    def test_cell_types(self):
+        rows = self.read_rows("xl/worksheets/sheet1.xml")
+        self.assertEqual(rows[0], ["Front", "Back", "Tags"])
+        # Shared strings, with formatted runs joined and phonetic hints dropped
+        self.assertEqual(rows[1], ["café", "bold and plain", "Geo::Europe"])
+        # Inline string, gap column and boolean
+        self.assertEqual(rows[3], ['inline, "quoted"', "", "TRUE"])
+        # Numbers as stored
+        self.assertEqual(rows[4], ["42.5", "FALSE"])
+
+    def test_skipped_rows_are_empty(self):
+        rows = self.read_rows("xl/worksheets/sheet1.xml")
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[2], [])
+
+    def test_leading_gap_column(self):
+        rows = self.read_rows("xl/worksheets/sheet2.xml")
+        self.assertEqual(rows, [["Front", "Back"], ["", "only B"]])
+
+
+class WorkbookTest(unittest.TestCase):
+    def setUp(self):
+        self.file = open(FIXTURE_PATH, "rb")
+        self.workbook = Workbook(self.file)
+
+    def tearDown(self):
+        self.workbook.close()
+        self.file.close()
+
+    def test_sheet_names(self):
+        self.assertEqual(self.workbook.get_sheet_names(), ["Vocab", "Second tab"])
+
+    def test_unknown_sheet(self):
+        with self.assertRaises(Exception):
+            list(self.workbook.iter_sheet_rows("Missing"))
+
+    def test_extract_sheet(self):
+        remote_csv = self.workbook.extract_sheet("Second tab", prefix_length=6)
+        try:
+            body = remote_csv.body.read()
+        finally:
+            remote_csv.close()
+        self.assertEqual(
+            list(csv.reader(io.StringIO(body.decode("utf-8")))),
+            [["Front", "Back"], ["", "only B"]],
+        )
+        self.assertEqual(remote_csv.content_length, len(body))
+        self.assertEqual(remote_csv.content_hash, hashlib.sha256(body).hexdigest())
+        self.assertEqual(remote_csv.prefix_hash, hashlib.sha256(body[:6]).hexdigest())
+
+    def test_not_an_xlsx_file(self):
+        with self.assertRaises(Exception):
+            Workbook(io.BytesIO(b"Front,Back\n"))
+
+
+class GetWorkbookUrlTest(unittest.TestCase):
+    def test_tab_url(self):
+        url = (
+            "https://docs.google.com/spreadsheets/d/e/2PACX-abc/pub"
+            "?gid=123&single=true&output=csv#gid=123"
+        )
+        self.assertEqual(
+            get_workbook_url(url),
+            "https://docs.google.com/spreadsheets/d/e/2PACX-abc/pub?output=xlsx",
+        )
+
+    def test_keeps_other_parameters(self):
+        url = "https://example.com/pub?output=csv&range=A1:B2&headers=1"
+        self.assertEqual(
+            get_workbook_url(url), "https://example.com/pub?headers=1&output=xlsx"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()